@@ -1,17 +1,155 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import io
 import os
+import threading
+from collections import OrderedDict
 from abc import abstractmethod
 from bisect import bisect_left, bisect, bisect_right
 from numbers import Number
-from typing import List, Union, Any, Generator
+from typing import List, Union, Any, Dict, Tuple, Callable, Optional
 
+import matplotlib.ticker as mticker
+import numpy as np
 from matplotlib.axes import Axes
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
 
+from ccrev.rules import SignalTable
+from ccrev.stats import PrefixSums, SlicedStats, StatsBackend, get_backend
+
+# friendly identifiers for what memoized chart values depend on
+Y_DATA = 'Y_DATA'
+X_DATA = 'X_DATA'
+WINDOW = 'WINDOW'  # data start/end indexes
+MEAN = 'MEAN'
+STDEV = 'STDEV'
+STATS_BACKEND = 'STATS_BACKEND'
+X_LABELS = 'X_LABELS'
+
+
+def as_buffer(data) -> np.ndarray:
+    """
+    store a data series in one contiguous array, float64 where possible
+    slicing the result gives views that don't copy the series
+    """
+    try:
+        return np.asarray(data, dtype=float)
+    except (TypeError, ValueError):
+        return np.asarray(data, dtype=object)  # i.e. datetimes
+
+
+def decimate(data: np.ndarray, num_buckets: int, keep: np.ndarray = None) -> np.ndarray:
+    """
+    indexes of the points of param data to draw so a line through them
+    looks the same as through every point at param num_buckets pixels wide
+
+    the first, last, min & max points of each bucket are kept along with
+    every point where param keep (a boolean array) is True
+    """
+    data = np.asarray(data, dtype=float)
+    bucket_size = -(-len(data) // num_buckets)  # ceil
+    if bucket_size <= 1:
+        return np.arange(len(data))
+
+    # padding repeats the last point so argmin/argmax never pick the padding
+    num_padded = -len(data) % bucket_size
+    buckets = np.pad(data, (0, num_padded), mode='edge').reshape(-1, bucket_size)
+    offsets = np.arange(0, len(data), bucket_size)
+    indexes = np.concatenate((
+        offsets,
+        np.minimum(offsets + bucket_size, len(data)) - 1,
+        offsets + buckets.argmin(axis=1),
+        offsets + buckets.argmax(axis=1),
+    ))
+    if keep is not None:
+        indexes = np.concatenate((indexes, np.flatnonzero(keep[:len(data)])))
+    return np.unique(indexes)
+
+
+def memoized(*depends_on: str) -> Callable:
+    """
+    cache a ControlChart method's return value until ControlChart._invalidate
+    is called with one of the values in param depends_on
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self):
+            try:
+                return self._cache[func.__name__][0]
+            except KeyError:
+                val = func(self)
+                self._cache[func.__name__] = val, depends_on
+                return val
+        return wrapper
+    return decorator
+
+
+class RenderCache:
+    """
+    bounded LRU cache of rendered chart images keyed on chart content
+
+    least recently used images are dropped once the cached images
+    take up more than max_bytes
+    """
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, key):
+        return key in self._images
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key: str, image: bytes) -> None:
+        with self._lock:
+            if len(image) > self.max_bytes:
+                return  # would evict everything & still not fit
+            if key in self._images:
+                self.size_bytes -= len(self._images.pop(key))
+            self._images[key] = image
+            self.size_bytes += len(image)
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.size_bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self.size_bytes = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits'      : self.hits,
+            'misses'    : self.misses,
+            'evictions' : self.evictions,
+            'images'    : len(self),
+            'size_bytes': self.size_bytes,
+        }
+
 
 class Plot:
     """
@@ -19,18 +157,33 @@ class Plot:
     include in reports
     """
     FIG_SIZE = (FIG_WIDTH, FIG_HEIGHT) = 6, 3  # in inches
+    DPI = 100  # matplotlib's default, raster images are FIG_SIZE * DPI pixels
+    IMAGE_FORMAT = 'png'
+
+    # signals are drawn over the data, one marker style per rule
+    # in colors apart from the limit lines except rule 1's
+    SIGNAL_STYLES = {
+        1: dict(color='r', marker='o'),
+        2: dict(color='m', marker='s'),
+        3: dict(color='saddlebrown', marker='^'),
+        4: dict(color='c', marker='D'),
+    }
+    SIGNAL_MARKER_SIZE = 2.2
 
     PLOT_COLS = PLOT_ROWS = PLOT_POS = 1
     _SUBPLOT_GRID = int(str(PLOT_ROWS) + str(PLOT_COLS) + str(PLOT_POS))
 
     def __init__(self, x_labels=None):
-        self.fig = Figure(Plot.FIG_SIZE)
+        self.fig = Figure(Plot.FIG_SIZE, dpi=Plot.DPI)
         self.canvas = FigureCanvas(self.fig)
         self.axes: Axes = self.fig.add_subplot(Plot._SUBPLOT_GRID)
         self.x_labels = x_labels
 
+        # named lines are kept so they can be redrawn with new data
+        self._lines: Dict[str, Line2D] = {}
+
     def add_line(self, y_data: List[Number], x_data: List[Number], **kwargs
-                 ) -> None:
+                 ) -> Line2D:
         """
         add a line to the plot
         """
@@ -40,11 +193,50 @@ class Plot:
                 **kwargs
         )
         self.axes.add_line(new_line)
+        return new_line
+
+    def set_line(self, name: str, y_data: List[Number], x_data: List[Number],
+                 **kwargs) -> None:
+        """
+        add a line to the plot or redraw the existing line with param name
+        """
+        line = self._lines.get(name)
+        if line is None:
+            self._lines[name] = self.add_line(y_data, x_data, **kwargs)
+            return
+        line.set_data(x_data, y_data)
+        line.update(kwargs)
+        line.set_visible(True)
+
+    def set_hline(self, name: str, y: Number, **kwargs) -> None:
+        """
+        add a horizontal line across the plot or move the existing line
+        with param name, costs the same for any length of data
+        """
+        line = self._lines.get(name)
+        if line is None:
+            self._lines[name] = self.axes.axhline(y, **kwargs)
+            return
+        line.set_ydata([y, y])
+        line.update(kwargs)
+        line.set_visible(True)
+
+    def reset(self) -> None:
+        """
+        hide all named lines & undo chart specific formatting
+        so the plot can be reused for another chart
+        """
+        for line in self._lines.values():
+            line.set_visible(False)
+        self.x_labels = None
+        self.axes.xaxis.set_major_formatter(mticker.ScalarFormatter())
+        self.axes.relim(visible_only=True)
+        self.axes.autoscale()
 
     @property
     def bytes(self) -> io.BytesIO:
         image_data = io.BytesIO()
-        self.fig.savefig(image_data, format='png')
+        self.fig.savefig(image_data, format=Plot.IMAGE_FORMAT)
         image_data.seek(0)
         return image_data
 
@@ -58,41 +250,82 @@ class Plot:
         else:
             self.canvas.print_jpeg(f'{file_path}.jpeg')
 
-    def show_signals(self, signals: List[int], x_data: List,
+    def show_signals(self, signal_table: SignalTable, x_data: List,
                      y_data: List[float]):
-        if not signals:
+        """
+        one line of markers per rule, each rule's points are picked
+        out of the data with SignalTable.mask
+        """
+        if not signal_table:
             return
 
-        x_data = [
-            data_index if signal > 0 else 0
-            for data_index, signal in zip(x_data, signals)
-        ]
-        y_data = [
-            val if signal > 0 else 0
-            for val, signal in zip(y_data, signals)
-        ]
-        while True:
-            try:
-                x_data.remove(0)
-                y_data.remove(0)
-            except ValueError:
-                break  # remove until none left
-
-        self.add_line(
-                x_data=x_data,
-                y_data=y_data,
-                color='r',
-                marker='o',
-                markersize=2.2,
-                linestyle='None'
-        )
+        x_data = np.asarray(x_data)
+        y_data = np.asarray(y_data)
+        for rule_number in signal_table.rule_numbers:
+            mask = signal_table.mask(rule_number)[:len(y_data)]
+            self.set_line(
+                    f'signals_{rule_number}',
+                    x_data=x_data[:len(mask)][mask],
+                    y_data=y_data[:len(mask)][mask],
+                    markersize=Plot.SIGNAL_MARKER_SIZE,
+                    linestyle='None',
+                    # lower rule numbers on top whatever order the lines were made in
+                    zorder=3 + 1 / rule_number,
+                    **Plot.SIGNAL_STYLES.get(rule_number, Plot.SIGNAL_STYLES[1])
+            )
+
+
+class PlotPool:
+    """
+    keeps built Plots so charts can be redrawn on an existing figure
+    instead of building a new figure, canvas & axes for every render
+    """
+    MAX_SIZE = 4
+
+    def __init__(self, max_size: int = MAX_SIZE):
+        self.max_size = max_size
+        self.created = 0
+        self.reused = 0
+        self._plots: List[Plot] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._plots)
+
+    def acquire(self) -> Plot:
+        with self._lock:
+            if self._plots:
+                self.reused += 1
+                return self._plots.pop()
+            self.created += 1
+        return Plot()
+
+    def release(self, plot: Plot) -> None:
+        plot.reset()
+        with self._lock:
+            if len(self._plots) < self.max_size:
+                self._plots.append(plot)
 
 
 class ControlChart:
+    render_cache: RenderCache = RenderCache()
+    plot_pool: Union[PlotPool, None] = PlotPool()  # None to build a new Plot per render
+    # longer data is decimated for drawing, None to draw every point
+    # set on a chart to override for that chart only
+    max_render_points: Union[int, None] = None
+
     def __init__(self, y_data=None, x_data=None, signals=None,
-                 title=None, x_labels=None):
+                 title=None, x_labels=None, stats_backend=None):
+
+        # method name -> (value, dependencies)
+        self._cache: Dict[str, Tuple[Any, Tuple[str, ...]]] = {}
 
         self.title = title
+        self.signal_table: SignalTable = None
+        if stats_backend is None:
+            from ccrev import config  # config imports the chart types
+            stats_backend = config.STATS_BACKEND
+        self._stats_backend: StatsBackend = get_backend(stats_backend)
         self.signals = signals
 
         self.mean_overwritten = False
@@ -101,8 +334,8 @@ class ControlChart:
         self._data_start_index: int = None
         self._data_end_index: int = None
 
-        self._y_data: List[float] = y_data or []
-        self._x_data = x_data or [idx for idx, _ in enumerate(self.y_data)]
+        self._y_data: np.ndarray = y_data if y_data is not None else []
+        self._x_data: np.ndarray = x_data if x_data is not None else np.arange(len(self.y_data))
         self._x_labels = x_labels
 
         self._stdev = self.stdev
@@ -130,38 +363,136 @@ class ControlChart:
         raise NotImplementedError
 
     @property
-    def y_data(self):
-        y_data = None
-        if isinstance(self._y_data, Generator):
-            y_data = list(self._y_data)
-            self.y_data = y_data
-        else:
-            y_data = self._y_data
-        return y_data[self._data_start_index:self._data_end_index]
+    def signals(self) -> Union[List[int], None]:
+        """
+        per-point rule numbers built from signal_table on request
+        """
+        if self.signal_table is None:
+            return None
+        return self.signal_table.to_ints()
+
+    @signals.setter
+    def signals(self, val: Union[List[int], None]):
+        self.signal_table = SignalTable.from_ints(val) if val is not None else None
+
+    def _invalidate(self, *changed: str) -> None:
+        """
+        drop memoized values that depend on anything in param changed
+        """
+        changed = set(changed)
+        for name, (_, depends_on) in list(self._cache.items()):
+            if changed.intersection(depends_on):
+                del self._cache[name]
+
+    @property
+    @memoized(Y_DATA)
+    def _full_y_data(self) -> np.ndarray:
+        if not isinstance(self._y_data, np.ndarray):
+            self.y_data = as_buffer(list(self._y_data))
+        return self._y_data
+
+    @property
+    @memoized(Y_DATA, WINDOW)
+    def y_data(self) -> np.ndarray:
+        """
+        view of the data between the chart's start & end, not a copy
+        """
+        return self._full_y_data[self._data_start_index:self._data_end_index]
 
     @y_data.setter
     def y_data(self, val):
         self._y_data = val
+        self._invalidate(Y_DATA)
 
     @property
-    def x_data(self):
-        x_data = None
-        if isinstance(self._x_data, Generator):
-            x_data = list(self._x_data)
-            self.x_data = x_data
-        else:
-            x_data = self._x_data
-        return x_data[self._data_start_index:self._data_end_index]
+    @memoized(X_DATA)
+    def _full_x_data(self) -> np.ndarray:
+        if not isinstance(self._x_data, np.ndarray):
+            self.x_data = as_buffer(list(self._x_data))
+        return self._x_data
+
+    @property
+    @memoized(X_DATA, WINDOW)
+    def x_data(self) -> np.ndarray:
+        """
+        view of the data index between the chart's start & end, not a copy
+        """
+        return self._full_x_data[self._data_start_index:self._data_end_index]
 
     @x_data.setter
     def x_data(self, val):
         self._x_data = val
+        self._invalidate(X_DATA)
+
+    def append_data(self, y_data, x_data, x_labels=None) -> None:
+        """
+        join points read after the chart's data was set onto its buffers
+        """
+        self.y_data = np.concatenate((self._full_y_data, as_buffer(y_data)))
+        self.x_data = np.concatenate((self._full_x_data, as_buffer(x_data)))
+        if x_labels is not None and self.x_labels is not None:
+            self.x_labels = list(self.x_labels) + list(x_labels)
+
+    @property
+    def stats_backend(self) -> StatsBackend:
+        return self._stats_backend
+
+    @stats_backend.setter
+    def stats_backend(self, val: Union[str, StatsBackend]):
+        self._stats_backend = get_backend(val)
+        self._invalidate(STATS_BACKEND, MEAN, STDEV)
+
+    @property
+    @memoized(Y_DATA, STATS_BACKEND)
+    def windowed_stats(self) -> Union[PrefixSums, SlicedStats]:
+        """
+        built once per data load, gives stats for any window of y_data
+        constant time for most windows with the NumPy backend
+        """
+        return self.stats_backend.windowed(self._full_y_data)
+
+    def window_stats(self, start: int = None, end: int = None
+                     ) -> Tuple[Union[float, None], Union[float, None]]:
+        """
+        (mean, stdev) of all y data in [start, end), see windowed_stats
+        defaults to the chart's current start/end
+        """
+        if start is None and end is None:
+            start, end = self._data_start_index, self._data_end_index
+        return self.windowed_stats.mean(start, end), self.windowed_stats.stdev(start, end)
+
+    def window_limits(self, start: int = None, end: int = None
+                      ) -> Union[Dict[str, float], None]:
+        """
+        center, warning & action limits of all y data in [start, end)
+        defaults to the chart's current start/end
+        """
+        mean, stdev = self.window_stats(start, end)
+        if mean is None or stdev is None:
+            return None
+        return {
+            'center'             : mean,
+            'upper_action_limit' : mean + 3 * stdev,
+            'lower_action_limit' : mean - 3 * stdev,
+            'upper_warning_limit': mean + 2 * stdev,
+            'lower_warning_limit': mean - 2 * stdev,
+            'plus_one_stdev'     : mean + stdev,
+            'minus_one_stdev'    : mean - stdev,
+        }
+
+    def start_at_index(self, idx):
+        self._data_start_index = idx
+        self._invalidate(WINDOW)
+
+    def end_at_index(self, idx):
+        self._data_end_index = idx
+        self._invalidate(WINDOW)
 
     def start_at_label(self, label):
-        self._data_start_index = self._nearest(self.x_labels, label)
+        self.start_at_index(self._nearest(self.x_labels, label))
 
     def end_at_label(self, label):
-        self._data_end_index = self._nearest(self.x_labels, label)
+        self.end_at_index(self._nearest(self.x_labels, label))
 
     @property
     def starts_at_label(self):
@@ -200,21 +531,25 @@ class ControlChart:
         raise NotImplementedError
 
     @property
+    @memoized(Y_DATA, WINDOW)
     def x_min(self):
-        return self.plotted_x_data[0] if self.y_data else None
+        return self.plotted_x_data[0] if len(self.y_data) else None
 
     @property
+    @memoized(Y_DATA, WINDOW)
     def x_max(self):
-        return self.plotted_x_data[len(self.plotted_x_data) - 1] if self.y_data\
+        return self.plotted_x_data[len(self.plotted_x_data) - 1] if len(self.y_data)\
             else None
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def y_min(self):
-        return self.mean - 3.5 * self.stdev if self.y_data else None
+        return self.mean - 3.5 * self.stdev if len(self.y_data) else None
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def y_max(self):
-        return self.mean + 3.5 * self.stdev if self.y_data else None
+        return self.mean + 3.5 * self.stdev if len(self.y_data) else None
 
     @classmethod
     def from_other_chart(cls, other_chart: ControlChart) -> ControlChart:
@@ -222,6 +557,7 @@ class ControlChart:
                 y_data=other_chart.y_data,
                 x_data=other_chart.x_data,
                 title=other_chart.title,
+                stats_backend=other_chart.stats_backend,
         )
 
     @property
@@ -270,25 +606,131 @@ class ControlChart:
         raise NotImplementedError
 
     @abstractmethod
-    def make_plot(self, show_signals=True) -> Plot:
+    def make_plot(self, show_signals=True, plot: Plot = None) -> Plot:
+        """
+        draw the chart on param plot, or on a new Plot if not given
+        """
         raise NotImplementedError
 
+    @property
+    @memoized(Y_DATA, X_DATA, WINDOW, X_LABELS, MEAN, STDEV, STATS_BACKEND)
+    def _render_digest(self) -> str:
+        """
+        digest of the data window, labels & stats drawn on the chart
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for series in (self.plotted_y_data, self.plotted_x_data):
+            series = np.ascontiguousarray(series)
+            digest.update(series.tobytes() if series.dtype != object else repr(series.tolist()).encode())
+        digest.update(repr((self.x_labels, self.mean, self.stdev)).encode())
+        return digest.hexdigest()
+
+    @property
+    def render_key(self) -> str:
+        """
+        identifies a rendered image of the chart in ControlChart.render_cache
+        """
+        digest = hashlib.blake2b(self._render_digest.encode(), digest_size=16)
+        if self.signal_table is not None:
+            digest.update(self.signal_table.records.tobytes())
+        digest.update(repr((
+            type(self).__name__, Plot.FIG_SIZE, Plot.IMAGE_FORMAT, self.max_render_points
+        )).encode())
+        return digest.hexdigest()
+
+    def render_indexes(self) -> Union[np.ndarray, None]:
+        """
+        indexes of the plotted data to draw with max_render_points
+        set, None to draw every point
+
+        points that signal or are past the action limits are always drawn,
+        only the drawing is decimated, rules are checked on all of the data
+        """
+        max_points = self.max_render_points
+        y_data = self.plotted_y_data
+        if max_points is None or len(y_data) <= max_points:
+            return None
+
+        keep = np.zeros(len(y_data), dtype=bool)
+        if self.signal_table is not None:
+            signal_mask = self.signal_table.mask()[:len(y_data)]
+            keep[:len(signal_mask)] = signal_mask
+        if self.mean is not None and self.stdev is not None:
+            keep |= np.abs(np.asarray(y_data, dtype=float) - self.mean) > 3 * self.stdev
+        # up to 4 points are drawn per bucket
+        return decimate(y_data, max(max_points // 4, 1), keep=keep)
+
     @property
     def bytes(self) -> io.BytesIO:
-        return self.plot.bytes
+        """
+        chart image, rendered only if an identical chart isn't cached
+        """
+        key = self.render_key
+        image = ControlChart.render_cache.get(key)
+        if image is None:
+            image = self.render()
+            ControlChart.render_cache.put(key, image)
+        return io.BytesIO(image)
 
     @property
-    def signals_in_chart(self) -> Union[List[int], None]:
-        if not self.signals:
-            return
+    def render_state(self) -> Dict[str, Any]:
+        """
+        the least state needed to render the chart in another process
+        """
+        return {
+            'chart_type'  : type(self),
+            'title'       : self.title,
+            'y_data'      : self.y_data,
+            'x_data'      : self.x_data,
+            'x_labels'    : self.x_labels,
+            'mean'        : self.mean,
+            'stdev'       : self.stdev,
+            'signal_table': self.signal_table,
+            # class attributes aren't carried over to spawned worker processes
+            'max_render_points': self.max_render_points,
+        }
 
-        unique_signals = sorted(set(self.signals))
+    @classmethod
+    def from_render_state(cls, render_state: Dict[str, Any]) -> ControlChart:
+        chart = cls(
+                y_data=render_state['y_data'],
+                x_data=render_state['x_data'],
+                title=render_state['title'],
+                x_labels=render_state['x_labels'],
+        )
+        chart.mean = render_state['mean']
+        chart.stdev = render_state['stdev']
+        chart.signal_table = render_state['signal_table']
+        chart.max_render_points = render_state['max_render_points']
+        return chart
+
+    def render(self) -> bytes:
+        """
+        rasterize the chart, reusing a pooled Plot if there is one
+        """
+        return self.with_plot(lambda plot: plot.bytes.getvalue())
+
+    def with_plot(self, func: Callable[[Plot], Any]) -> Any:
+        """
+        call param func with the chart's plot, made on a pooled Plot
+        if there is one, the plot shouldn't be kept after func returns
+        """
+        plot_pool = ControlChart.plot_pool
+        if plot_pool is None:
+            return func(self.plot)
+
+        plot = plot_pool.acquire()
         try:
-            unique_signals.remove(0)
-        except ValueError:
-            pass
+            return func(self.make_plot(plot=plot))
+        finally:
+            plot_pool.release(plot)
 
-        return unique_signals
+    @property
+    def signals_in_chart(self) -> Union[List[int], None]:
+        if not self.signal_table:
+            return
+
+        return self.signal_table.rule_numbers
 
     def save_as_jpeg(self, file_path: str):
         # TODO
@@ -319,4 +761,3 @@ class ControlChart:
             return 0
         else:
             return bisect_left(seq, val)
-
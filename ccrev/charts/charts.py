@@ -1,11 +1,12 @@
-import statistics
 from datetime import datetime
 from typing import List, Generator
 
 import matplotlib.ticker as mticker
+import numpy as np
 
 from ccrev import config
-from ccrev.charts.charting_base import ControlChart, Plot
+from ccrev.charts.charting_base import ControlChart, Plot, memoized, \
+    Y_DATA, WINDOW, MEAN, STDEV, X_LABELS
 
 
 class IChart(ControlChart):
@@ -33,12 +34,14 @@ class IChart(ControlChart):
     @x_labels.setter
     def x_labels(self, val):
         self._x_labels = val
+        self._invalidate(X_LABELS)
 
     @property
+    @memoized(Y_DATA, WINDOW, STDEV)
     def stdev(self):
         if self.stdev_overwritten:
             return self._stdev
-        return statistics.stdev(self.y_data) if self.y_data else None
+        return self.window_stats()[1] if len(self.y_data) else None
 
     @stdev.setter
     def stdev(self, val):
@@ -46,12 +49,14 @@ class IChart(ControlChart):
             val = [v for v in val][0]
         self.stdev_overwritten = True
         self._stdev = val
+        self._invalidate(STDEV)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN)
     def mean(self):
         if self.mean_overwritten:
             return self._mean
-        return statistics.mean(self.y_data) if self.y_data else None
+        return self.window_stats()[0] if len(self.y_data) else None
 
     @mean.setter
     def mean(self, val):
@@ -59,96 +64,93 @@ class IChart(ControlChart):
             val = [v for v in val][0]
         self.mean_overwritten = True
         self._mean = val
+        self._invalidate(MEAN)
 
     @property
+    @memoized(Y_DATA, WINDOW)
     def plotted_y_data(self):
         """data sometimes needs to be transformed before plotting"""
         return self.y_data
 
     @property
+    @memoized(Y_DATA, WINDOW)
     def plotted_x_data(self):
         """data_index sometimes needs to be transformed before plotting"""
-        return [idx for idx, val in enumerate(self.plotted_y_data, start=1)]
+        return np.arange(1, len(self.plotted_y_data) + 1)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def center(self):
         return [self.mean] * len(self.plotted_x_data)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def upper_action_limit(self):
         return [self.mean + 3 * self.stdev] * len(self.plotted_x_data)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def lower_action_limit(self):
         return [self.mean - 3 * self.stdev] * len(self.plotted_x_data)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def upper_warning_limit(self):
         return [self.mean + 2 * self.stdev] * len(self.plotted_x_data)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def lower_warning_limit(self):
         return [self.mean - 2 * self.stdev] * len(self.plotted_x_data)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def plus_one_stdev(self):
         return [self.mean + self.stdev] * len(self.plotted_x_data)
 
     @property
+    @memoized(Y_DATA, WINDOW, MEAN, STDEV)
     def minus_one_stdev(self):
         return [self.mean - self.stdev] * len(self.plotted_x_data)
 
     @property
-    def plot(self, show_signals=True) -> Plot:
-        plot = Plot()
+    def plot(self) -> Plot:
+        return self.make_plot()
+
+    def make_plot(self, show_signals=True, plot: Plot = None) -> Plot:
+        plot = plot or Plot()
         # TODO 
         #  create dict instance attr that these calls pull values from  
         #  would allow for more customization of charts
 
-        plot.add_line(
-                self.plotted_y_data,
-                x_data=self.plotted_x_data,
+        y_data, x_data = self.plotted_y_data, self.plotted_x_data
+        render_indexes = self.render_indexes()
+        if render_indexes is not None:
+            y_data, x_data = y_data[render_indexes], x_data[render_indexes]
+        plot.set_line(
+                'data',
+                y_data,
+                x_data=x_data,
                 color='b'
         )
-        plot.add_line(
-                self.center,
-                x_data=self.plotted_x_data,
-                color='k'
-        )
-        plot.add_line(
-                self.upper_action_limit,
-                x_data=self.plotted_x_data,
-                color='r'
-        )
-        plot.add_line(
-                self.lower_action_limit,
-                x_data=self.plotted_x_data,
-                color='r'
-        )
-        plot.add_line(
-                self.upper_warning_limit,
-                x_data=self.plotted_x_data,
-                color=config.ORANGE
-        )  # orange
-        plot.add_line(
-                self.lower_warning_limit,
-                x_data=self.plotted_x_data,
-                color=config.ORANGE
-        )
-        plot.add_line(
-                self.plus_one_stdev,
-                x_data=self.plotted_x_data,
-                color='g'
-        )
-        plot.add_line(
-                self.minus_one_stdev,
-                x_data=self.plotted_x_data,
-                color='g'
-        )
+
+        if len(self.plotted_y_data):
+            # (name, stdevs from mean, color)
+            limits = (
+                ('center', 0, 'k'),
+                ('upper_action_limit', 3, 'r'),
+                ('lower_action_limit', -3, 'r'),
+                ('upper_warning_limit', 2, config.ORANGE),  # orange
+                ('lower_warning_limit', -2, config.ORANGE),
+                ('plus_one_stdev', 1, 'g'),
+                ('minus_one_stdev', -1, 'g'),
+            )
+            for name, num_stdevs, color in limits:
+                plot.set_hline(name, self.mean + num_stdevs * self.stdev, color=color)
 
         if show_signals:
             plot.show_signals(
-                    self.signals,
+                    self.signal_table,
                     x_data=self.plotted_x_data,
                     y_data=self.plotted_y_data
             )
@@ -3,6 +3,7 @@ from typing import Tuple
 
 from ccrev.charts.charts import IChart
 from ccrev.rules import Rule1, Rule2, Rule3, Rule4
+from ccrev.stats import NUMPY
 
 # friendly identifiers for stats data
 STDEV = 'STDEV'
@@ -24,8 +25,13 @@ WS_MEAN_ADDR: Tuple[int, int] = (2, 15)  # row, col
 WS_STDEV_ADDR: Tuple[int, int] = (2, 16)  # row, col
 EXCEL_FILE_EXTENSIONS = ('.xlsx', '.xlsm', '.xltx', '.xltm')
 CSV_FILE_EXTENSIONS = ('.csv',)
+CSV_DELIMITERS: str = ',;\t|'  # tried in turn when sniffing csv files
+CSV_DATETIME_FORMATS = ('%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y', '%m/%d/%y %H:%M')
 IGNORE_FILES = ('~$',)
 EXCLUDE_CELL_VALUES = (None, '#REF!')
+STATS_BACKEND = NUMPY  # one of ccrev.stats.STATS_BACKENDS
+EXTRACTION_CACHE_DIR: str = os.path.join(os.path.expanduser('~'), '.ccrev', 'extraction_cache')
+EXTRACTION_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
 
 # for testing
 REVIEWER_KWARGS = {
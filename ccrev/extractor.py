@@ -1,9 +1,33 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
 import os
+import posixpath
 import re
-from typing import Union, List, Any, Tuple, Dict
+import shutil
+import tempfile
+import weakref
+import zipfile
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from typing import Union, List, Any, Tuple, Dict, Iterable
+from warnings import warn
+from xml.etree import ElementTree
 
+import numpy as np
 import openpyxl
 from openpyxl import Workbook
+from openpyxl.cell.text import Text
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, SECS_PER_DAY, from_excel, from_ISO8601
+)
 
 from ccrev import config
 
@@ -20,16 +44,705 @@ def _gen_stop_at(stop):
     return decorator
 
 
-class DataExtractor:
-    def __init__(self):
-        self.workbooks: Dict[str, Workbook] = {}
+# (min_row, max_row, min_col, max_col, sheet_index)
+Region = Tuple[int, int, int, int, int]
+
+
+# (path, size, mtime_ns, content hash)
+# the content hash is None for files that haven't been hashed
+Fingerprint = Tuple[str, int, int, Union[str, None]]
+
+
+def fingerprint(src_file: str) -> Fingerprint:
+    stat = os.stat(src_file)
+    content_hash = hashlib.blake2b()
+    with open(src_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            content_hash.update(chunk)
+    return os.path.abspath(src_file), stat.st_size, stat.st_mtime_ns, content_hash.hexdigest()
+
+
+def is_unchanged(src_file: str, old_fingerprint: Fingerprint) -> bool:
+    """
+    files with the same size & mtime are taken as unchanged without
+    hashing them, otherwise the content hash decides. files that weren't
+    hashed before are taken as changed
+    """
+    stat = os.stat(src_file)
+    if (stat.st_size, stat.st_mtime_ns) == old_fingerprint[1:3]:
+        return True
+    return old_fingerprint[3] is not None and fingerprint(src_file)[3] == old_fingerprint[3]
+
+
+class XlsxColumnReader:
+    """
+    reads single column regions straight from a workbook's sheet xml,
+    only cells in the requested columns are decoded
+
+    values are the same gen_items_in_region yields from openpyxl.
+    the sheet is parsed until every region has hit its first None &
+    date cells are converted from Excel serials in bulk once read
+    """
+    MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+    def __init__(self, src_file):
+        self.archive = zipfile.ZipFile(src_file)
+        workbook_path = self._find_targets('', '_rels/.rels')['officeDocument'][0]
+        targets = self._find_targets(posixpath.dirname(workbook_path), self._rels_path(workbook_path))
+
+        workbook = ElementTree.fromstring(self.archive.read(workbook_path))
+        workbook_pr = workbook.find(f'{self.MAIN_NS}workbookPr')
+        date1904 = workbook_pr is not None and workbook_pr.get('date1904') in ('1', 'true')
+        self.epoch: datetime = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+        # chartsheets aren't worksheets so aren't counted by sheet_index
+        worksheet_paths = dict(targets.get('worksheet', (None, []))[1])
+        self.worksheet_paths: List[str] = [
+            worksheet_paths[sheet.get(f'{self.REL_NS}id')]
+            for sheet in workbook.iter(f'{self.MAIN_NS}sheet')
+            if sheet.get(f'{self.REL_NS}id') in worksheet_paths
+        ]
+        self.shared_strings_path = targets.get('sharedStrings', [None])[0]
+        self._shared_strings: List[str] = None
+        self.date_styles, self.timedelta_styles = self._read_date_styles(
+                targets.get('styles', [None])[0]
+        )
+
+    def close(self) -> None:
+        self.archive.close()
+
+    @staticmethod
+    def _rels_path(path: str) -> str:
+        return posixpath.join(posixpath.dirname(path), '_rels', posixpath.basename(path) + '.rels')
+
+    def _find_targets(self, base_dir: str, rels_path: str) -> Dict[str, Tuple[str, List[Tuple[str, str]]]]:
+        """
+        map the last part of each relationship type to its first target
+        & every (id, target) pair of that type
+        """
+        targets = {}
+        for rel in ElementTree.fromstring(self.archive.read(rels_path)).iter(f'{self.PKG_REL_NS}Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(base_dir, target))
+            rel_type = rel.get('Type').rsplit('/', 1)[-1]
+            _, pairs = targets.setdefault(rel_type, (target, []))
+            pairs.append((rel.get('Id'), target))
+        return targets
+
+    def _read_date_styles(self, styles_path: str) -> Tuple[set, set]:
+        """
+        indexes of the cell styles with date & timedelta number formats
+        """
+        date_styles, timedelta_styles = set(), set()
+        if styles_path is None:
+            return date_styles, timedelta_styles
+        styles = ElementTree.fromstring(self.archive.read(styles_path))
+        custom_formats = {
+            int(num_fmt.get('numFmtId')): num_fmt.get('formatCode')
+            for num_fmt in styles.iter(f'{self.MAIN_NS}numFmt')
+        }
+        cell_xfs = styles.find(f'{self.MAIN_NS}cellXfs')
+        for idx, xf in enumerate([] if cell_xfs is None else cell_xfs.iter(f'{self.MAIN_NS}xf')):
+            num_fmt_id = int(xf.get('numFmtId', 0))
+            fmt = custom_formats.get(num_fmt_id) or builtin_format_code(num_fmt_id)
+            if is_date_format(fmt):
+                date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                timedelta_styles.add(idx)
+        return date_styles, timedelta_styles
+
+    @property
+    def shared_strings(self) -> List[str]:
+        # only read if a requested column holds a shared string
+        if self._shared_strings is None:
+            with self.archive.open(self.shared_strings_path) as src:
+                self._shared_strings = read_string_table(src)
+        return self._shared_strings
+
+    def read_regions(self, regions: Iterable[Region]) -> Dict[Region, List[Any]]:
+        columns = {}
+        regions_by_sheet: Dict[int, List[Region]] = {}
+        for region in regions:
+            regions_by_sheet.setdefault(region[4], []).append(region)
+        for sheet_index, sheet_regions in regions_by_sheet.items():
+            columns.update(self._scan_regions(sheet_index, sheet_regions))
+        return columns
+
+    def _scan_regions(self, sheet_index: int, regions: List[Region]) -> Dict[Region, List[Any]]:
+        row_tag, cell_tag, sheet_data_tag = (
+            f'{self.MAIN_NS}row', f'{self.MAIN_NS}c', f'{self.MAIN_NS}sheetData'
+        )
+        dimension_tag = f'{self.MAIN_NS}dimension'
+
+        columns = {region: [] for region in regions}
+        # serials of date cells, converted once the sheet is read
+        dates = {region: [] for region in regions}
+        open_regions = [
+            [region, region[0] or 1, region[1], region[2] or 1] for region in regions
+        ]
+        wanted_cols = {col for *_, col in open_regions}
+
+        last_row = 0
+        sheet_data = None
+        with self.archive.open(self.worksheet_paths[sheet_index]) as src:
+            for event, element in ElementTree.iterparse(src, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == sheet_data_tag:
+                        sheet_data = element
+                    continue
+                if element.tag == dimension_tag:
+                    # unset max rows stop at the sheet's dimensions, as in openpyxl
+                    max_row = range_boundaries(element.get('ref'))[3]
+                    for open_region in open_regions:
+                        if open_region[2] is None:
+                            open_region[2] = max_row
+                    continue
+                if element.tag != row_tag:
+                    continue
+
+                row_idx = int(float(element.get('r'))) if element.get('r') else last_row + 1
+                if row_idx <= last_row:
+                    # repeated rows are skipped by openpyxl too
+                    sheet_data.clear()
+                    continue
+
+                row = {}
+                col_idx = 0
+                for cell in element.iter(cell_tag):
+                    ref = cell.get('r')
+                    col_idx = column_index_from_string(ref.rstrip('0123456789')) if ref else col_idx + 1
+                    if col_idx in wanted_cols:
+                        row[col_idx] = cell
+                sheet_data.clear()
+
+                still_open = []
+                for open_region in open_regions:
+                    region, min_row, max_row, col = open_region
+                    # rows missing between the last row & this one are empty
+                    gap_start, gap_end = max(last_row + 1, min_row), row_idx - 1
+                    if max_row is not None:
+                        gap_end = min(gap_end, max_row)
+                    if gap_start <= gap_end:
+                        continue
+                    if row_idx < min_row:
+                        still_open.append(open_region)
+                        continue
+                    if max_row is not None and row_idx > max_row:
+                        continue
+                    cell = row.get(col)
+                    val = None if cell is None else self._cell_value(cell)
+                    if val is None:
+                        continue
+                    if isinstance(val, _DateSerial):
+                        dates[region].append((len(columns[region]), val))
+                    columns[region].append(val)
+                    still_open.append(open_region)
+                open_regions = still_open
+                last_row = row_idx
+                if not open_regions:
+                    break
+
+        for region, serials in dates.items():
+            if serials:
+                self._convert_dates(columns[region], serials)
+        return columns
+
+    def _cell_value(self, cell) -> Any:
+        data_type = cell.get('t', 'n')
+        if data_type == 'inlineStr':
+            child = cell.find(f'{self.MAIN_NS}is')
+            return None if child is None else Text.from_tree(child).content
+
+        value = cell.findtext(f'{self.MAIN_NS}v', None) or None
+        if value is None:
+            return None
+        if data_type == 'n':
+            style_id = int(cell.get('s', 0))
+            value = float(value) if '.' in value or 'E' in value or 'e' in value else int(value)
+            if style_id in self.date_styles:
+                return _DateSerial(value, style_id in self.timedelta_styles)
+            return value
+        if data_type == 's':
+            return self.shared_strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'd':
+            return from_ISO8601(value)
+        return value
+
+    def _convert_dates(self, column: List[Any], serials: List[Tuple[int, '_DateSerial']]) -> None:
+        """
+        replace date serials in param column with datetimes
+
+        serials openpyxl turns into datetimes the usual way are converted
+        together, times, timedeltas & serials before 1900-03-01 or near
+        the end of the calendar go through from_excel one at a time
+        """
+        values = np.array([serial.value for _, serial in serials], dtype=float)
+        in_bulk = np.array([not serial.is_timedelta for _, serial in serials]) & \
+            (values >= (1 if self.epoch == CALENDAR_MAC_1904 else 60)) & \
+            (values < (datetime.max - self.epoch).days)
+
+        days, fractions = np.divmod(values[in_bulk], 1)
+        converted = (
+                np.datetime64(self.epoch, 'ms')
+                + days.astype('timedelta64[D]')
+                + np.round(fractions * SECS_PER_DAY * 1000).astype('timedelta64[ms]')
+        ).astype('datetime64[us]').tolist()
+
+        converted = iter(converted)
+        for (position, serial), bulk in zip(serials, in_bulk):
+            if bulk:
+                column[position] = next(converted)
+                continue
+            try:
+                column[position] = from_excel(serial.value, self.epoch, timedelta=serial.is_timedelta)
+            except (OverflowError, ValueError):
+                warn(f'Serial value {serial.value} is outside the limits for dates.')
+                column[position] = '#VALUE!'
+
+
+class CsvColumnReader:
+    """
+    reads single column regions of a delimited text file using the same
+    1 indexed rows & cols as workbooks, a file is a single sheet
+
+    cells are kept as text while scanning & each column is parsed
+    in bulk once read, into ints, floats, datetimes or strings
+    """
+
+    def __init__(self, src_file):
+        self.src = open(src_file, newline='', encoding='utf-8-sig')
+        sample = self.src.read(4096)
+        self.src.seek(0)
+        try:
+            self.dialect = csv.Sniffer().sniff(sample, delimiters=config.CSV_DELIMITERS)
+        except csv.Error:
+            self.dialect = csv.excel
+
+    def close(self) -> None:
+        self.src.close()
+
+    def read_regions(self, regions: Iterable[Region]) -> Dict[Region, List[Any]]:
+        regions = list(regions)
+        if any(region[4] != 0 for region in regions):
+            raise IndexError('list index out of range')
+
+        columns = {region: [] for region in regions}
+        open_regions = [
+            (region, region[0] or 1, region[1], region[2] or 1) for region in regions
+        ]
+        for row_idx, row in enumerate(csv.reader(self.src, self.dialect), 1):
+            still_open = []
+            for open_region in open_regions:
+                region, min_row, max_row, col = open_region
+                if row_idx < min_row:
+                    still_open.append(open_region)
+                    continue
+                if max_row is not None and row_idx > max_row:
+                    continue
+                val = row[col - 1] if col <= len(row) else ''
+                if val == '':
+                    continue
+                columns[region].append(val)
+                still_open.append(open_region)
+            open_regions = still_open
+            if not open_regions:
+                break
+
+        return {region: self.parse_column(column) for region, column in columns.items()}
+
+    @staticmethod
+    def parse_column(column: List[str]) -> List[Any]:
+        """
+        parse a whole column as the first type every value fits,
+        mixed columns are parsed value by value
+        """
+        text = np.array(column, dtype=str)
+        for dtype in (np.int64, np.float64, 'datetime64[us]'):
+            try:
+                return text.astype(dtype).tolist()
+            except (ValueError, OverflowError):
+                continue
+        for datetime_format in config.CSV_DATETIME_FORMATS:
+            try:
+                return [datetime.strptime(val, datetime_format) for val in column]
+            except ValueError:
+                continue
+        return [CsvColumnReader._parse_value(val) for val in column]
+
+    @staticmethod
+    def _parse_value(val: str) -> Union[int, float, str]:
+        for cast in (int, float):
+            try:
+                return cast(val)
+            except ValueError:
+                continue
+        return val
+
+
+class _DateSerial:
+    """
+    an Excel serial in a date cell waiting to be converted
+    """
+    __slots__ = ('value', 'is_timedelta')
+
+    def __init__(self, value, is_timedelta):
+        self.value = value
+        self.is_timedelta = is_timedelta
+
+
+class ExtractionCache:
+    """
+    columns read from workbooks, saved as .npz files in param cache_dir
+
+    entries are keyed on a workbook's path, size, mtime & content hash
+    and the regions read from it, so a changed file or extraction config
+    is never served stale data. least recently used entries are removed
+    once the directory grows past param max_bytes
+
+    columns of mixed types are saved as json text with each value tagged
+    by its type, nothing is pickled so files in cache_dir can't run code
+    """
+    FILE_EXTENSION = '.npz'
+
+    # type -> (to json, from json) for values of mixed columns
+    # values are tagged with their type's name
+    MIXED_TYPES = {
+        bool     : (bool, bool),
+        int      : (int, int),
+        float    : (float, float),
+        str      : (str, str),
+        datetime : (datetime.isoformat, datetime.fromisoformat),
+        date     : (date.isoformat, date.fromisoformat),
+        time     : (time.isoformat, time.fromisoformat),
+        timedelta: (lambda val: val // timedelta(microseconds=1), lambda val: timedelta(microseconds=val)),
+    }
+    _FROM_JSON = {val_type.__name__: from_json for val_type, (_, from_json) in MIXED_TYPES.items()}
+
+    def __init__(self, cache_dir: str, max_bytes: int = config.EXTRACTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _sorted_regions(regions: Iterable[Region]) -> List[Region]:
+        # regions can hold None so sort by repr
+        return sorted(set(regions), key=repr)
 
-    def add_workbook(self, src_file, title: str = None) -> Workbook:
-        return self.workbooks.setdefault(
-                title or self.clean_file_names(src_file),
-                openpyxl.load_workbook(src_file, read_only=True, data_only=True)
+    def _path(self, src_fingerprint: Fingerprint, regions: List[Region]) -> str:
+        key = repr((src_fingerprint, regions)).encode()
+        return os.path.join(
+                self.cache_dir,
+                hashlib.blake2b(key, digest_size=16).hexdigest() + self.FILE_EXTENSION
         )
 
+    def get(self, src_file: str, regions: Iterable[Region],
+            src_fingerprint: Fingerprint = None) -> Union[Dict[Region, List[Any]], None]:
+        """
+        param src_fingerprint saves hashing src_file when it's known
+        """
+        regions = self._sorted_regions(regions)
+        path = self._path(src_fingerprint or fingerprint(src_file), regions)
+        try:
+            with np.load(path, allow_pickle=False) as columns:
+                columns = {
+                    region: self._from_array(columns[f'region_{idx}'])
+                    for idx, region in enumerate(regions)
+                }
+        except (OSError, KeyError, ValueError, TypeError, zipfile.BadZipFile):
+            return None
+        os.utime(path)  # mark as recently used
+        return columns
+
+    def put(self, src_file: str, columns: Dict[Region, List[Any]],
+            src_fingerprint: Fingerprint = None) -> None:
+        """
+        columns holding values of a type not in MIXED_TYPES aren't cached
+        """
+        regions = self._sorted_regions(columns)
+        path = self._path(src_fingerprint or fingerprint(src_file), regions)
+        try:
+            arrays = {f'region_{idx}': self._to_array(columns[region]) for idx, region in enumerate(regions)}
+        except TypeError:
+            return
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+        self.evict()
+
+    @classmethod
+    def _to_array(cls, values: List[Any]) -> np.ndarray:
+        """
+        typed array for columns of a single type that comes back the same
+        from .tolist(), otherwise a 0-d array of the tagged values as json
+        """
+        for dtype in (float, 'datetime64[us]', str):
+            try:
+                array = np.array(values, dtype=dtype)
+            except (TypeError, ValueError):
+                continue
+            restored = array.tolist()
+            if restored == values and all(type(a) is type(b) for a, b in zip(restored, values)):
+                return array
+
+        def tag(val):
+            if val is None:
+                return None
+            if type(val) not in cls.MIXED_TYPES:
+                raise TypeError(f'{type(val).__name__} values can\'t be cached')
+            return type(val).__name__, cls.MIXED_TYPES[type(val)][0](val)
+
+        return np.array(json.dumps([tag(val) for val in values]))
+
+    @classmethod
+    def _from_array(cls, array: np.ndarray) -> List[Any]:
+        if array.ndim:
+            return array.tolist()
+        return [
+            None if val is None else cls._FROM_JSON[val[0]](val[1])
+            for val in json.loads(str(array))
+        ]
+
+    def evict(self) -> None:
+        entries = [
+            os.path.join(self.cache_dir, file) for file in os.listdir(self.cache_dir)
+            if file.endswith(self.FILE_EXTENSION)
+        ]
+        entries.sort(key=os.path.getmtime)
+        total = sum(os.path.getsize(entry) for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= os.path.getsize(entry)
+            os.remove(entry)
+
+    def clear(self) -> None:
+        for file in os.listdir(self.cache_dir):
+            if file.endswith(self.FILE_EXTENSION):
+                os.remove(os.path.join(self.cache_dir, file))
+
+
+class WorkbookPool(Mapping):
+    """
+    read-only workbooks by title, opened on demand
+
+    at most max_open workbooks are kept open, with sources taking up at
+    most max_bytes. least recently used workbooks are closed first &
+    reopened the next time they're used, uploaded sources are written
+    to a temp file when closed so their bytes aren't kept in memory.
+    the temp files are removed by close(), or once the pool is garbage
+    collected or the interpreter exits
+
+    rows being iterated from a workbook that's closed can't be read,
+    so only use one workbook at a time when max_open is small
+    """
+    MAX_OPEN = 64
+    MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, max_open: int = MAX_OPEN, max_bytes: int = MAX_BYTES):
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.opens = 0
+        self.reopens = 0
+        self.evictions = 0
+        self.sources: Dict[str, Any] = {}
+        self._open: OrderedDict[str, Workbook] = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._spill_dir: str = None
+        self._remove_spill_dir: weakref.finalize = None
+
+    def __len__(self):
+        return len(self.sources)
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __contains__(self, title):
+        return title in self.sources
+
+    def __getitem__(self, title: str) -> Workbook:
+        if title in self._open:
+            self._open.move_to_end(title)
+            return self._open[title]
+        if title not in self.sources:
+            raise KeyError(title)
+
+        if title in self._sizes:
+            self.reopens += 1
+        self.opens += 1
+        src_file = self.sources[title]
+        workbook = openpyxl.load_workbook(src_file, read_only=True, data_only=True)
+        self._open[title] = workbook
+        self._sizes[title] = self._source_size(src_file)
+        self.size_bytes += self._sizes[title]
+        self._evict()
+        return workbook
+
+    def add(self, title: str, src_file) -> Workbook:
+        self.sources[title] = src_file
+        return self[title]
+
+    def remove(self, title: str) -> None:
+        if title in self._open:
+            self._close(title)
+        self._sizes.pop(title, None)
+        src_file = self.sources.pop(title, None)
+        if self._spill_dir and isinstance(src_file, str) and src_file.startswith(self._spill_dir):
+            os.remove(src_file)
+
+    @property
+    def open_titles(self) -> List[str]:
+        return list(self._open)
+
+    def _evict(self) -> None:
+        # the workbook just used is never closed
+        while len(self._open) > 1 and (
+                len(self._open) > self.max_open or self.size_bytes > self.max_bytes
+        ):
+            self._close(next(iter(self._open)))
+            self.evictions += 1
+
+    def _close(self, title: str) -> None:
+        self._open.pop(title).close()
+        self.size_bytes -= self._sizes[title]
+        src_file = self.sources[title]
+        if isinstance(src_file, io.BytesIO):
+            self.sources[title] = self._spill(title, src_file)
+            self._sizes[title] = os.path.getsize(self.sources[title])
+
+    def _spill(self, title: str, src_file: io.BytesIO) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='ccrev_workbooks_')
+            self._remove_spill_dir = weakref.finalize(self, shutil.rmtree, self._spill_dir, ignore_errors=True)
+        fd, path = tempfile.mkstemp(suffix='.xlsx', dir=self._spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(src_file.getbuffer())
+        src_file.close()
+        return path
+
+    @staticmethod
+    def _source_size(src_file) -> int:
+        if isinstance(src_file, io.BytesIO):
+            return src_file.getbuffer().nbytes
+        return os.path.getsize(src_file)
+
+    def close(self) -> None:
+        for title in list(self.sources):
+            self.remove(title)
+        if self._spill_dir:
+            self._remove_spill_dir()
+            self._spill_dir = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'open'      : len(self._open),
+            'size_bytes': self.size_bytes,
+            'opens'     : self.opens,
+            'reopens'   : self.reopens,
+            'evictions' : self.evictions,
+        }
+
+
+class DataExtractor:
+    def __init__(self, cache: ExtractionCache = None, fast_reader: bool = False,
+                 max_open: int = WorkbookPool.MAX_OPEN,
+                 max_bytes: int = WorkbookPool.MAX_BYTES):
+        self.workbooks: WorkbookPool = WorkbookPool(max_open, max_bytes)
+        self.src_files: Dict[str, Any] = {}
+        self.cache: ExtractionCache = cache
+
+        # src file fingerprints by title, so each file is hashed once per load
+        self.fingerprints: Dict[str, Fingerprint] = {}
+
+        # read regions with XlsxColumnReader instead of opening workbooks
+        self.fast_reader = fast_reader
+
+        # values already read from workbooks, served instead of the workbook
+        self.extracted: Dict[str, Dict[Region, List[Any]]] = {}
+
+    def add_src_file(self, src_file, title: str = None) -> str:
+        """
+        record where a title's regions are read from without opening it
+        returns the title
+        """
+        title = title or self.clean_file_names(src_file)
+        self.src_files[title] = src_file
+        return title
+
+    def add_workbook(self, src_file, title: str = None) -> Union[Workbook, None]:
+        """
+        csv files, or any file with fast_reader set,
+        aren't opened until regions are read
+        """
+        title = self.add_src_file(src_file, title)
+        if self.fast_reader or self.is_csv(src_file):
+            return None
+        if title in self.workbooks:
+            return self.workbooks[title]
+        return self.workbooks.add(title, src_file)
+
+    def remove_workbook(self, title: str) -> None:
+        """
+        close & forget a workbook along with anything read from it
+        """
+        self.workbooks.remove(title)
+        self.src_files.pop(title, None)
+        self.fingerprints.pop(title, None)
+        self.extracted.pop(title, None)
+
+    def src_fingerprint(self, title: str, hashed: bool = True) -> Fingerprint:
+        """
+        fingerprint of a title's src file, only hashed again once its
+        size or mtime changes
+
+        with hashed False a file is never hashed for this call, its
+        fingerprint has no content hash unless one is already known
+        """
+        src_file = self.src_files[title]
+        old_fingerprint = self.fingerprints.get(title)
+        stat = os.stat(src_file)
+        if old_fingerprint is None or (stat.st_size, stat.st_mtime_ns) != old_fingerprint[1:3]:
+            if not hashed:
+                return os.path.abspath(src_file), stat.st_size, stat.st_mtime_ns, None
+            self.fingerprints[title] = fingerprint(src_file)
+        return self.fingerprints[title]
+
+    def load_cached(self, src_file, regions: Iterable[Region], title: str = None) -> bool:
+        """
+        serve param regions of an unchanged src file from the cache
+        without opening it, returns False if they aren't cached
+        """
+        if not self._can_cache(src_file):
+            return False
+        title = self.add_src_file(src_file, title)
+        columns = self.cache.get(src_file, regions, self.src_fingerprint(title))
+        if columns is None:
+            return False
+        self.extracted[title] = columns
+        return True
+
+    @staticmethod
+    def is_csv(src_file) -> bool:
+        return isinstance(src_file, (str, os.PathLike)) and \
+            os.fspath(src_file).endswith(config.CSV_FILE_EXTENSIONS)
+
+    @staticmethod
+    def _open_reader(src_file) -> Union[XlsxColumnReader, CsvColumnReader]:
+        if DataExtractor.is_csv(src_file):
+            return CsvColumnReader(src_file)
+        return XlsxColumnReader(src_file)
+
+    def _can_cache(self, src_file) -> bool:
+        # uploaded files are file-like objects & can't be fingerprinted
+        return self.cache is not None and isinstance(src_file, (str, os.PathLike))
+
     def get_region_iter(
             self, title, min_row, max_row,
             min_col, max_col, sheet_index, values_only=True
@@ -38,14 +751,123 @@ class DataExtractor:
         ws = self.workbooks[title].worksheets[sheet_index]
         return ws.iter_rows(*reg, values_only)
 
-    @_gen_stop_at(None)
     def gen_items_in_region(
             self, title, min_row, max_row, min_col,
             max_col, sheet_index, values_only=True
+    ):
+        reg = min_row, max_row, min_col, max_col
+        extracted = self.extracted.get(title, {})
+        if (*reg, sheet_index) in extracted:
+            yield from extracted[(*reg, sheet_index)]
+        elif title not in self.workbooks:
+            yield from self.read_regions(title, [(*reg, sheet_index)])[(*reg, sheet_index)]
+        else:
+            yield from self._gen_items_in_region(title, *reg, sheet_index, values_only)
+
+    @_gen_stop_at(None)
+    def _gen_items_in_region(
+            self, title, min_row, max_row, min_col,
+            max_col, sheet_index, values_only=True
     ):
         reg = min_row, max_row, min_col, max_col
         yield from self.get_region_iter(title, *reg, sheet_index, values_only)
 
+    def read_regions(self, title, regions: Iterable[Region]) -> Dict[Region, List[Any]]:
+        """
+        read single column regions of a workbook, each region's
+        sheet is read in one pass no matter how many regions are on it
+
+        returns the same values gen_items_in_region yields for each region
+        """
+        columns = {}
+        regions_by_sheet: Dict[int, List[Region]] = {}
+        extracted = self.extracted.get(title, {})
+        for region in regions:
+            if region in extracted:
+                columns[region] = extracted[region]
+            else:
+                regions_by_sheet.setdefault(region[4], []).append(region)
+
+        if regions_by_sheet and title not in self.workbooks:
+            reader = self._open_reader(self.src_files[title])
+            try:
+                columns.update(reader.read_regions(itertools.chain(*regions_by_sheet.values())))
+            finally:
+                reader.close()
+        else:
+            for sheet_index, sheet_regions in regions_by_sheet.items():
+                columns.update(self._scan_regions(title, sheet_index, sheet_regions))
+        if regions_by_sheet and self._can_cache(self.src_files.get(title)):
+            self.cache.put(self.src_files[title], columns, self.src_fingerprint(title))
+        return columns
+
+    def _scan_regions(
+            self, title, sheet_index, regions: List[Region]
+    ) -> Dict[Region, List[Any]]:
+        # unset rows & cols default the same way they do for iter_rows
+        # regions are read from min_col, as in _gen_stop_at
+        min_rows = [region[0] or 1 for region in regions]
+        max_rows = [region[1] for region in regions]
+        cols = [region[2] or 1 for region in regions]
+        first_row, first_col = min(min_rows), min(cols)
+
+        columns = {region: [] for region in regions}
+        open_regions = list(zip(regions, min_rows, max_rows, cols))
+        rows = self.get_region_iter(
+                title,
+                first_row,
+                None if None in max_rows else max(max_rows),
+                first_col,
+                max(cols),
+                sheet_index
+        )
+        for row_idx, row in enumerate(rows, first_row):
+            still_open = []
+            for region, min_row, max_row, col in open_regions:
+                if row_idx < min_row:
+                    still_open.append((region, min_row, max_row, col))
+                    continue
+                if max_row is not None and row_idx > max_row:
+                    continue
+                val = row[col - first_col]
+                if val is None:
+                    continue
+                columns[region].append(val)
+                still_open.append((region, min_row, max_row, col))
+            open_regions = still_open
+            if not open_regions:
+                break
+        return columns
+
+    def add_workbooks(
+            self, src_files: List[str], regions: List[Region], jobs: int = 1
+    ) -> Dict[str, Exception]:
+        """
+        read param regions from many workbooks at once in a pool of
+        param jobs processes, workbooks are closed once read
+
+        returns the error raised for each file that couldn't be read
+        the rest of the files are still read
+        """
+        errors = {}
+        src_files = [src_file for src_file in src_files if not self.load_cached(src_file, regions)]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(extract_regions, src_file, regions, self.fast_reader)
+                for src_file in src_files
+            ]
+            for src_file, future in zip(src_files, futures):
+                title = self.clean_file_names(src_file)
+                try:
+                    columns = future.result()
+                except Exception as e:
+                    errors[src_file] = e
+                    continue
+                self.extracted[title] = columns
+                if self._can_cache(src_file):
+                    self.cache.put(src_file, columns, self.src_fingerprint(title))
+        return errors
+
     @staticmethod
     def gen_files(
             src_dir: str,
@@ -70,3 +892,19 @@ class DataExtractor:
         src_file = os.path.basename(src_file)
         src_file = DataExtractor.remove_file_extensions(src_file)
         return src_file
+
+
+def extract_regions(
+        src_file: str, regions: List[Region], fast_reader: bool = False
+) -> Dict[Region, List[Any]]:
+    """
+    open a workbook, read each region & close it
+    module level so it can be sent to worker processes
+    """
+    data_extractor = DataExtractor(fast_reader=fast_reader)
+    title = data_extractor.clean_file_names(src_file)
+    data_extractor.add_workbook(src_file, title)
+    try:
+        return data_extractor.read_regions(title, regions)
+    finally:
+        data_extractor.workbooks.close()
@@ -9,7 +9,10 @@ from ccrev.config import TEST_DIR
 from ccrev.reviewer import Reviewer
 
 if __name__ == '__main__':
-    reviewer = Reviewer(**config.REVIEWER_KWARGS)
+    reviewer = Reviewer(
+        **config.REVIEWER_KWARGS,
+        extraction_cache_dir=config.EXTRACTION_CACHE_DIR
+    )
 
     # test dir
     reviewer.add_charts(
@@ -19,9 +22,9 @@ if __name__ == '__main__':
 
     # REMOVE THESE BECAUSE THEY SHOULD BE MR CHARTS
     remove = ('CO2 by CarboQC', 'SO2 by Mettler')
-    for index, title in enumerate(reviewer.chart_titles):
+    for title in reviewer.chart_titles:
         if any(rem in title for rem in remove):
-            del reviewer.control_charts[index]
+            reviewer.remove_chart(title)
 
     # TODO separate DataExtractor from reviewer
     #  want to be able to extract data
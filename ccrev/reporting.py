@@ -1,23 +1,376 @@
+import gc
+import hashlib
 import io
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, date
-from typing import Union, List, Any
+from numbers import Number
+from typing import Union, List, Any, Tuple, Dict, Iterator
 
+import numpy as np
+from matplotlib.backend_bases import RendererBase, GraphicsContextBase
+from matplotlib.path import Path
 from reportlab.lib.enums import TA_LEFT
 from reportlab.lib.pagesizes import LETTER
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
 from reportlab.platypus import SimpleDocTemplate, Paragraph, \
-    Spacer, Image, PageBreak
+    Spacer, Image, PageBreak, Flowable
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
 
-from ccrev.charts.charting_base import ControlChart
+from ccrev.charts.charting_base import ControlChart, Plot
+
+
+class PageConcatenator:
+    """
+    writes the pages of many pdfs to one pdf file, one pdf at a time
+
+    each pdf's objects are renumbered & written out as soon as it's
+    appended, only the page numbers & object offsets are kept until
+    close() writes the page tree
+    """
+    PAGES_ID = 1
+    CATALOG_ID = 2
+
+    def __init__(self, file):
+        self.file = file
+        self._pos = 0
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._next_id = self.CATALOG_ID + 1
+        self._write(b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n')
+
+    def _write(self, data: bytes) -> None:
+        self.file.write(data)
+        self._pos += len(data)
+
+    def _write_object(self, obj_id: int, obj) -> None:
+        self._offsets[obj_id] = self._pos
+        data = io.BytesIO()
+        obj.write_to_stream(data)
+        self._write(b'%d 0 obj\n%s\nendobj\n' % (obj_id, data.getvalue()))
+
+    def append(self, pdf: bytes) -> None:
+        reader = PdfReader(io.BytesIO(pdf))
+        new_ids: Dict[int, int] = {}
+        to_write: List[int] = []
+
+        def renumber(obj):
+            if isinstance(obj, IndirectObject):
+                if obj.idnum not in new_ids:
+                    new_ids[obj.idnum] = self._next_id
+                    self._next_id += 1
+                    to_write.append(obj.idnum)
+                return IndirectObject(new_ids[obj.idnum], 0, reader)
+            if isinstance(obj, DictionaryObject):
+                for key, val in dict.items(obj):
+                    dict.__setitem__(obj, key, renumber(val))
+            elif isinstance(obj, ArrayObject):
+                for idx, val in enumerate(list.__iter__(obj)):
+                    list.__setitem__(obj, idx, renumber(val))
+            return obj
+
+        page_idnums = {page.indirect_reference.idnum for page in reader.pages}
+        for page in reader.pages:
+            self._page_ids.append(renumber(page.indirect_reference).idnum)
+        while to_write:
+            idnum = to_write.pop()
+            obj = reader.get_object(idnum)
+            if idnum in page_idnums:
+                # pages hang off this file's page tree, the pdf's own
+                # page tree & catalog are never written
+                obj = DictionaryObject(obj)
+                del obj[NameObject('/Parent')]
+                obj = renumber(obj)
+                obj[NameObject('/Parent')] = IndirectObject(self.PAGES_ID, 0, None)
+            else:
+                obj = renumber(obj)
+            self._write_object(new_ids[idnum], obj)
+
+    def close(self) -> None:
+        pages = DictionaryObject({
+            NameObject('/Type') : NameObject('/Pages'),
+            NameObject('/Kids') : ArrayObject(IndirectObject(page_id, 0, None) for page_id in self._page_ids),
+            NameObject('/Count'): NumberObject(len(self._page_ids)),
+        })
+        self._write_object(self.PAGES_ID, pages)
+        self._write_object(self.CATALOG_ID, DictionaryObject({
+            NameObject('/Type') : NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self.PAGES_ID, 0, None),
+        }))
+
+        xref_pos = self._pos
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % self._next_id)
+        for obj_id in range(1, self._next_id):
+            self._write(b'%010d 00000 n \n' % self._offsets[obj_id])
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            self._next_id, self.CATALOG_ID, xref_pos
+        ))
+
+
+def build_chart_pages(chart: Union[ControlChart, Dict[str, Any]], chart_comments: str = None,
+                      signal_labels: Union[List[Any], None] = None,
+                      vector: bool = False, image_data: bytes = None) -> bytes:
+    """
+    lay out one chart's pages of a report as a pdf of their own
+    module level so it can be done in worker processes, which are sent
+    the chart's ControlChart.render_state
+
+    the chart's image is rendered without ControlChart.render_cache
+    unless param image_data is given, so nothing rendered outlives the pages
+    """
+    if isinstance(chart, dict):
+        chart = chart['chart_type'].from_render_state(chart)
+    if not vector and image_data is None:
+        image_data = chart.render()
+    report = Report(vector=vector)
+    report.add_chart(
+            chart,
+            chart_comments,
+            signal_labels=signal_labels,
+            image_data=None if vector else io.BytesIO(image_data)
+    )
+    return report.build_pages()
+
+
+class ChartPages:
+    """
+    a chart's place in a streaming or multi-process report, its pages
+    are laid out only when the report is saved
+
+    with use_render_cache an image already in ControlChart.render_cache
+    is used instead of rendering the chart again
+    """
+
+    def __init__(self, chart: ControlChart, chart_comments: str = None,
+                 signal_labels: Union[List[Any], None] = None, vector: bool = False,
+                 use_render_cache: bool = False):
+        self.chart = chart
+        self.chart_comments = chart_comments
+        self.signal_labels = signal_labels
+        self.vector = vector
+        self.use_render_cache = use_render_cache
+
+    def _cached_image(self) -> Union[bytes, None]:
+        if not self.use_render_cache or self.vector:
+            return None
+        return ControlChart.render_cache.get(self.chart.render_key)
+
+    def build(self) -> bytes:
+        return build_chart_pages(
+                self.chart, self.chart_comments, self.signal_labels, self.vector, self._cached_image()
+        )
+
+    def submit(self, executor: ProcessPoolExecutor) -> Future:
+        return executor.submit(
+                build_chart_pages,
+                self.chart.render_state,
+                self.chart_comments,
+                self.signal_labels,
+                self.vector,
+                self._cached_image()
+        )
+
+
+class ReportLabRenderer(RendererBase):
+    """
+    draws a matplotlib figure onto a ReportLab canvas as vector paths & text
+
+    units are points, text is set in the standard Helvetica fonts so only
+    their metrics are used for laying out the figure
+    """
+    FONT = 'Helvetica'
+    BOLD_FONT = 'Helvetica-Bold'
+
+    def __init__(self, canv, width: float, height: float):
+        super().__init__()
+        self.canv = canv
+        self.width = width
+        self.height = height
+
+    def flipy(self):
+        return False
+
+    def get_canvas_width_height(self):
+        return self.width, self.height
+
+    def points_to_pixels(self, points):
+        return points
+
+    def new_gc(self):
+        return GraphicsContextBase()
+
+    def _font(self, prop) -> Tuple[str, float]:
+        weight = prop.get_weight()
+        bold = weight == 'bold' or (isinstance(weight, Number) and weight >= 600)
+        return self.BOLD_FONT if bold else self.FONT, prop.get_size_in_points()
+
+    def get_text_width_height_descent(self, s, prop, ismath):
+        font, size = self._font(prop)
+        ascent, descent = pdfmetrics.getAscentDescent(font, size)
+        return pdfmetrics.stringWidth(s, font, size), ascent - descent, -descent
+
+    def draw_text(self, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+        self.canv.saveState()
+        self._apply_clip(gc)
+        self.canv.setFillColorRGB(*gc.get_rgb()[:3], alpha=gc.get_alpha())
+        self.canv.setFont(*self._font(prop))
+        self.canv.translate(x, y)
+        self.canv.rotate(angle)
+        self.canv.drawString(0, 0, s)
+        self.canv.restoreState()
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        clip = (0, 0, self.width, self.height) if rgbFace is None and gc.get_hatch() is None else None
+        path = path.cleaned(
+                transform, remove_nans=True, clip=clip, simplify=path.should_simplify, curves=True
+        )
+        self._draw_path(gc, path, rgbFace, clip=True)
+
+    def _draw_path(self, gc, path: Path, rgbFace=None, clip: bool = True) -> None:
+        line_width = gc.get_linewidth()
+        stroke = line_width > 0 and gc.get_rgb()[3] > 0
+        fill = rgbFace is not None and (len(rgbFace) < 4 or rgbFace[3] > 0)
+        if not (stroke or fill):
+            return
+
+        pdf_path = self.canv.beginPath()
+        # hundredths of a point are finer than any printer or zoom level needs
+        vertices = np.round(path.vertices, 2).tolist()
+        start = current = (0, 0)
+        for idx, code in enumerate(path.codes.tolist()):
+            if code == Path.MOVETO:
+                start = current = vertices[idx]
+                pdf_path.moveTo(*current)
+            elif code == Path.LINETO:
+                current = vertices[idx]
+                pdf_path.lineTo(*current)
+            elif code == Path.CURVE3:
+                # quadratic -> cubic bezier, vertices are (control, end) pairs
+                (x0, y0), (cx, cy), (x, y) = current, vertices[idx], vertices[idx + 1]
+                pdf_path.curveTo(
+                        x0 + 2 / 3 * (cx - x0), y0 + 2 / 3 * (cy - y0),
+                        x + 2 / 3 * (cx - x), y + 2 / 3 * (cy - y),
+                        x, y
+                )
+                current = x, y
+            elif code == Path.CURVE4:
+                current = vertices[idx + 2]
+                pdf_path.curveTo(*vertices[idx], *vertices[idx + 1], *current)
+            elif code == Path.CLOSEPOLY:
+                pdf_path.close()
+                current = start
+
+        self.canv.saveState()
+        clip and self._apply_clip(gc)
+        if stroke:
+            self.canv.setStrokeColorRGB(*gc.get_rgb()[:3], alpha=gc.get_alpha())
+            self.canv.setLineWidth(line_width)
+            self.canv.setLineCap({'butt': 0, 'round': 1, 'projecting': 2}[gc.get_capstyle()])
+            self.canv.setLineJoin({'miter': 0, 'round': 1, 'bevel': 2}[gc.get_joinstyle()])
+            offset, dashes = gc.get_dashes()
+            self.canv.setDash(list(dashes) if dashes else [], offset or 0)
+        if fill:
+            alpha = gc.get_alpha() if gc.get_forced_alpha() or len(rgbFace) < 4 else rgbFace[3]
+            self.canv.setFillColorRGB(*rgbFace[:3], alpha=alpha)
+        self.canv.drawPath(pdf_path, stroke=int(stroke), fill=int(fill))
+        self.canv.restoreState()
+
+    def draw_markers(self, gc, marker_path, marker_trans, path, trans, rgbFace=None):
+        """
+        the marker is drawn once to a form that's placed at each point
+        instead of drawing a full path per point
+        """
+        offsets = trans.transform(path.vertices)
+        offsets = np.round(offsets[np.isfinite(offsets).all(axis=1)], 2).tolist()
+        if not offsets:
+            return
+
+        marker = marker_trans.transform_path(marker_path).cleaned(curves=True)
+
+        # markers drawn the same way share a form across the whole report
+        style = (
+            gc.get_linewidth(), gc.get_rgb(), gc.get_alpha(), gc.get_dashes(),
+            gc.get_capstyle(), gc.get_joinstyle(), None if rgbFace is None else tuple(rgbFace)
+        )
+        form_name = 'marker' + hashlib.blake2b(
+                np.round(marker.vertices, 2).tobytes() + marker.codes.tobytes() + repr(style).encode(),
+                digest_size=8
+        ).hexdigest()
+        if not self.canv.hasForm(form_name):
+            (x0, y0), (x1, y1) = marker.get_extents().padded(gc.get_linewidth()).get_points()
+            self.canv.beginForm(form_name, x0, y0, x1, y1)
+            self._draw_path(gc, marker, rgbFace, clip=False)
+            self.canv.endForm()
+
+        self.canv.saveState()
+        self._apply_clip(gc)
+        for x, y in offsets:
+            self.canv.saveState()
+            self.canv.translate(x, y)
+            self.canv.doForm(form_name)
+            self.canv.restoreState()
+        self.canv.restoreState()
+
+    def _apply_clip(self, gc) -> None:
+        clip_rect = gc.get_clip_rectangle()
+        if clip_rect is not None:
+            clip_path = self.canv.beginPath()
+            clip_path.rect(*clip_rect.bounds)
+            self.canv.clipPath(clip_path, stroke=0, fill=0)
+
+
+class VectorChart(Flowable):
+    """
+    a chart drawn straight onto the report's canvas as vector graphics,
+    laid out at the same size as the chart's raster image
+    """
+
+    def __init__(self, chart: ControlChart):
+        super().__init__()
+        self.chart = chart
+        self.hAlign = 'CENTER'
+
+    def wrap(self, avail_width, avail_height):
+        return Plot.FIG_WIDTH * Plot.DPI, Plot.FIG_HEIGHT * Plot.DPI
+
+    def draw(self):
+        self.chart.with_plot(self._draw_plot)
+
+    def _draw_plot(self, plot: Plot) -> None:
+        fig = plot.fig
+        dpi = fig.dpi
+        width, height = fig.get_size_inches() * 72
+        fig.dpi = 72  # there are 72 pdf points to an inch
+        self.canv.saveState()
+        try:
+            self.canv.scale(dpi / 72, dpi / 72)
+            fig.draw(ReportLabRenderer(self.canv, width, height))
+        finally:
+            self.canv.restoreState()
+            fig.dpi = dpi
 
 
 class Report:
     """
     defines styling properties for PDF reports also
     provides an interface for adding content to PDFs
+
+    when streaming each chart's pages are laid out & written to the
+    report file one chart at a time when the report is saved, so memory
+    use doesn't grow with the number of charts. with jobs > 1 charts'
+    pages are laid out in a pool of that many processes & written in
+    chart order. vector charts are drawn onto the page as paths & text
+    instead of images
     """
 
-    def __init__(self, name=date.today()):
+    def __init__(self, name=date.today(), streaming: bool = False, vector: bool = False,
+                 jobs: int = 1):
+        self.streaming = streaming
+        self.vector = vector
+        self.jobs = jobs
+
         # reportlab template
         self.doc_template = SimpleDocTemplate
 
@@ -41,15 +394,18 @@ class Report:
 
         # altering these during runtime may break program
         self._name = f'{name}.pdf'  # alter name via obj.name
-        self._report = self.doc_template(
-                self.name,
+        self._report = self._make_doc_template(self.name)
+        self._text = []
+
+    def _make_doc_template(self, filename) -> SimpleDocTemplate:
+        return self.doc_template(
+                filename,
                 pagesize=self.page_size,
                 rightMargin=self.right_margin,
                 leftMargin=self.left_margin,
                 topmargin=self.top_margin,
                 bottomMargin=self.bottom_margin
         )
-        self._text = []
 
     @property
     def name(self):
@@ -75,6 +431,14 @@ class Report:
                 Image(image_data)
         )
 
+    def add_chart_pages(self, chart_pages: ChartPages):
+        self._text.append(chart_pages)
+
+    def add_vector_chart(self, chart: ControlChart):
+        self._text.append(
+                VectorChart(chart)
+        )
+
     def add_spacer(self, height=1, width=12):
         self._text.append(Spacer(height, width))
 
@@ -83,17 +447,88 @@ class Report:
             self._text.append(PageBreak())
 
     def save(self):
-        self._report.build(self._text)
+        if not self.streaming and self.jobs <= 1:
+            self._report.build(self._text)
+            return
+
+        with open(self._report.filename, 'wb') as report_file:
+            pages = PageConcatenator(report_file)
+            for part in self._gen_parts():
+                pages.append(part)
+                # reportlab's doc templates & canvases hold reference cycles,
+                # without this each part's objects pile up until a full collection
+                gc.collect()
+            pages.close()
+
+    def _gen_parts(self) -> Iterator[bytes]:
+        """
+        the pdf of each chart's pages & of any flowables added between
+        them, in report order
+
+        with jobs > 1 chart pages are laid out in worker processes at
+        most 2 * jobs charts ahead of the part being written. charts
+        that fail in a worker are laid out again in this process
+        """
+        parts: List[Union[ChartPages, List[Flowable]]] = []
+        for flowable in self._text:
+            if isinstance(flowable, ChartPages):
+                parts.append(flowable)
+            elif parts and isinstance(parts[-1], list):
+                parts[-1].append(flowable)
+            else:
+                parts.append([flowable])
+
+        if self.jobs <= 1:
+            for part in parts:
+                yield part.build() if isinstance(part, ChartPages) else self.build_pages(part)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            pending = deque()
+            for part in parts:
+                pending.append((part, part.submit(executor) if isinstance(part, ChartPages) else None))
+                if len(pending) > 2 * self.jobs:
+                    yield self._finish_part(*pending.popleft())
+            while pending:
+                yield self._finish_part(*pending.popleft())
+
+    def _finish_part(self, part: Union[ChartPages, List[Flowable]], future: Union[Future, None]) -> bytes:
+        if future is None:
+            return self.build_pages(part)
+        try:
+            return future.result()
+        except Exception as e:
+            print(f'Laying out chart pages failed in worker process: {part.chart.title}: {e!r}')
+            return part.build()
+
+    def build_pages(self, flowables: List[Flowable] = None) -> bytes:
+        """
+        lay out param flowables, or the report's, as a pdf in memory
+        """
+        pages = io.BytesIO()
+        self._make_doc_template(pages).build(self._text if flowables is None else flowables)
+        return pages.getvalue()
 
     def add_chart(self, chart: ControlChart, chart_comments: str = None, *,
-                  signal_labels: Union[List[Any], None] = None) -> None:
+                  signal_labels: Union[List[Any], None] = None,
+                  image_data: io.BytesIO = None) -> None:
+        if (self.streaming or self.jobs > 1) and image_data is None:
+            self.add_chart_pages(ChartPages(
+                    chart, chart_comments, signal_labels, self.vector, use_render_cache=not self.streaming
+            ))
+            return
+
         self.add_text(chart.title)
         self.add_spacer()
-        self.add_image(chart.bytes)
+        if self.vector:
+            self.add_vector_chart(chart)
+        else:
+            self.add_image(image_data or chart.bytes)
         self.add_spacer()
         if chart.signals_in_chart:
+            labels = SignalLabels(chart, signal_labels)
             for signal_id in chart.signals_in_chart:
-                signal_str = self.stringify_signals(signal_id, chart, labels=signal_labels)
+                signal_str = self.stringify_signals(signal_id, chart, labels=labels)
                 self.add_text(f'{signal_id}: {signal_str}')
                 self.add_spacer()
         else:
@@ -104,43 +539,58 @@ class Report:
         self.add_page_break()
 
     @staticmethod
-    def stringify_signals(signal_id: int, chart: ControlChart, labels: Union[List[Any], None] = None) -> str:
+    def stringify_signals(signal_id: int, chart: ControlChart,
+                          labels: Union[List[Any], 'SignalLabels', None] = None) -> str:
         """
         return a string of the plotted indices where there are signals
         sequential signals are hyphenated (i.e. [1,1,0,1] -> '0 - 1, 3')
-        """
-
-        def short_str(dt: datetime) -> str:
-            dt = dt.month, dt.day, dt.hour, dt.minute
-            dt = (str(val) for val in dt)
-            dt = (f'0{val}' if len(val) is 1 else val for val in dt)  # prepend '0' to single-char strings
-            return '%s/%s %s:%s' % tuple(dt)  # mm/dd hh:mm
 
+        pass the same SignalLabels as param labels for each of a chart's
+        rules to format its labels once for all of them
+        """
         target_signal = signal_id
         if target_signal not in chart.signals_in_chart:
             return 'No signals found.'
 
-        signals = list(signal_id if signal_id in (0, target_signal) else 0 for signal_id in chart.signals)
-        labels = labels if labels else chart.plotted_x_data
-        labels = [short_str(val) if isinstance(val, datetime) else val for val in labels]
-
-        s: str = ''
-        start: Union[int, None] = None
-        for idx, (label, signal) in enumerate(zip(labels, signals)):
-            if signal:
-                if start is not None:  # continue consecutive signals
-                    if idx is len(signals) - 1:  # end of signals sequence
-                        s += f' - {label}'
-                    else:
-                        continue
-                else:
-                    s += f'{label}'
-                    start = idx
+        if not isinstance(labels, SignalLabels):
+            labels = SignalLabels(chart, labels)
+
+        signal_ranges = []
+        for start, end in chart.signal_table.runs(target_signal):
+            if start >= len(labels):
+                break
+            end = min(end, len(labels))
+            if end - start == 1:  # lone signal
+                signal_ranges.append(labels[start])
             else:
-                if start is not None:  # end consecutive signals
-                    if idx - start is 1:  # lone signal
-                        s += ', '
-                    if idx - start > 1:
-                        s += f' - {labels[idx - 1]}, '
-                    start = None
-        return s
+                signal_ranges.append(f'{labels[start]} - {labels[end - 1]}')
+        return ', '.join(signal_ranges)
+
+
+class SignalLabels:
+    """
+    the x labels of a chart's signal ranges, each label is formatted
+    only when first asked for & kept for the chart's other rules
+    """
+
+    def __init__(self, chart: ControlChart, labels: Union[List[Any], None] = None):
+        self.labels = labels if labels is not None and len(labels) else chart.plotted_x_data
+        self._formatted: Dict[int, str] = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx: int) -> str:
+        try:
+            return self._formatted[idx]
+        except KeyError:
+            label = self._formatted[idx] = self.format(self.labels[idx])
+            return label
+
+    @staticmethod
+    def format(val: Any) -> str:
+        if isinstance(val, np.generic):
+            val = val.item()
+        if isinstance(val, datetime):
+            return f'{val:%m/%d %H:%M}'
+        return f'{val}'
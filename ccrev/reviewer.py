@@ -1,21 +1,92 @@
+import os
 from datetime import datetime
-from typing import List, Union, Any, Type
+from typing import List, Union, Any, Type, Dict, Iterator
 
 import matplotlib.ticker as mticker
 
 from ccrev import config
 from ccrev.charts.charting_base import ControlChart
-from ccrev.extractor import DataExtractor
+from ccrev.extractor import DataExtractor, ExtractionCache, Region, is_unchanged
 from ccrev.reporting import Report
-from ccrev.rule_checking import RuleChecker
+from ccrev.rule_checking import RuleChecker, StreamingRuleChecker
+from ccrev.stats import StatsBackend, get_backend
+
+
+class ChartRegistry:
+    """
+    charts in report order, indexed by title
+
+    lookups by title or position are constant time, removing a chart
+    renumbers the charts after it
+    """
+
+    def __init__(self):
+        # title -> [src_file, ControlChart]
+        self._entries: Dict[str, List[Union[str, ControlChart]]] = {}
+        self._titles: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._titles)
+
+    def __contains__(self, title):
+        return title in self._entries
+
+    def __iter__(self) -> Iterator[List[Union[str, ControlChart]]]:
+        return (self._entries[title] for title in self._titles)
+
+    @property
+    def titles(self) -> List[str]:
+        return list(self._titles)
+
+    def add(self, title: str, src_file, chart: ControlChart) -> None:
+        if title in self._entries:
+            raise ValueError('Chart title cannot be a duplicate')
+        self._entries[title] = [src_file, chart]
+        self._positions[title] = len(self._titles)
+        self._titles.append(title)
+
+    def remove(self, title: str) -> List[Union[str, ControlChart]]:
+        pos = self._positions.pop(title)
+        del self._titles[pos]
+        for idx in range(pos, len(self._titles)):
+            self._positions[self._titles[idx]] = idx
+        return self._entries.pop(title)
+
+    def chart(self, title: str) -> ControlChart:
+        return self._entries[title][1]
+
+    def src_file(self, title: str):
+        return self._entries[title][0]
+
+    def replace_chart(self, title: str, chart: ControlChart) -> None:
+        self._entries[title][1] = chart
+
+    def position(self, title: str) -> int:
+        return self._positions[title]
+
+    def title_at(self, pos: int) -> str:
+        return self._titles[pos]
+
+    def swap(self, pos1: int, pos2: int) -> None:
+        title1, title2 = self._titles[pos1], self._titles[pos2]
+        self._titles[pos1], self._titles[pos2] = title2, title1
+        self._positions[title1], self._positions[title2] = \
+            self._positions[title2], self._positions[title1]
 
 
 class Reviewer:
     DefaultReport: Type[Report] = Report
+    DefaultRuleChecker: Type[RuleChecker] = RuleChecker
 
     def __init__(self, y_data_col=None, x_data_col=None, x_label_col=None,
                  min_row=None, max_row=None, rules=None, data_sheet_index=None,
-                 load_stats_from_src=False, **stats_data_addresses):
+                 load_stats_from_src=False,
+                 rule_checker_type: Type[RuleChecker] = None,
+                 stats_backend: Union[str, StatsBackend] = None,
+                 extraction_cache_dir: str = None,
+                 fast_xlsx_reader: bool = False,
+                 **stats_data_addresses):
 
         # works on equal length data cols starting & stopping at given min & max
         self.y_data_col = y_data_col
@@ -27,36 +98,76 @@ class Reviewer:
         self.stats_data_addresses = stats_data_addresses
 
         self.report: Report = None
-        self.data_extractor: DataExtractor = DataExtractor()
-        self.rule_checker: RuleChecker = RuleChecker(rules=rules)
+        self.data_extractor: DataExtractor = DataExtractor(
+                cache=extraction_cache_dir and ExtractionCache(extraction_cache_dir),
+                fast_reader=fast_xlsx_reader
+        )
+        self.rule_checker: RuleChecker = (
+                rule_checker_type or Reviewer.DefaultRuleChecker
+        )(rules=rules)
 
         self.config = {
             'try_to_load_stats_data': load_stats_from_src,
+            'stats_backend'         : get_backend(stats_backend or config.STATS_BACKEND),
         }
 
-        # List[List[title, ControlChart]]
-        self.control_chart_data: List[List[Union[str, ControlChart]]] = []
+        self.charts: ChartRegistry = ChartRegistry()
         self._active_data = None
 
+        # src files that couldn't be loaded by add_charts
+        self.load_errors: Dict[str, Exception] = {}
+
+        # fingerprint & rows read from each data col of each src file, used by refresh
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def control_chart_data(self) -> List[List[Union[str, ControlChart]]]:
+        # List[List[src_file, ControlChart]]
+        return list(self.charts)
+
     @property
     def control_charts(self) -> List[ControlChart]:
-        return [chart_item[1] for chart_item in self.control_chart_data]
+        return [chart_item[1] for chart_item in self.charts]
 
     @property
     def chart_src_files(self) -> List[str]:
-        return [chart_item[0] for chart_item in self.control_chart_data]
+        return [chart_item[0] for chart_item in self.charts]
 
     @property
     def chart_titles(self):
-        return [chart_item[1].title for chart_item in self.control_chart_data]
-
-    def add_charts(self, src_dir: str, chart_type: Type[ControlChart]) -> None:
-        for file in self.data_extractor.gen_files(src_dir):
-            self.add_chart(file, chart_type)
+        return self.charts.titles
+
+    def add_charts(self, src_dir: str, chart_type: Type[ControlChart],
+                   jobs: int = 1) -> None:
+        """
+        with jobs > 1 the src files are opened & read in a pool of that
+        many processes. files that can't be read are kept in load_errors
+        & skipped, the rest are still added in directory order
+        """
+        files = self.data_extractor.gen_files(
+                src_dir,
+                config.EXCEL_FILE_EXTENSIONS + config.CSV_FILE_EXTENSIONS
+        )
+        if jobs <= 1:
+            for file in files:
+                self.add_chart(file, chart_type)
+            return
+
+        files = list(files)
+        errors = self.data_extractor.add_workbooks(
+                files,
+                list(self.data_regions.values()),
+                jobs
+        )
+        for file in files:
+            if file in errors:
+                print(f'Could not load {file}: {errors[file]!r}')
+                self.load_errors[file] = errors[file]
+            else:
+                self.add_chart(file, chart_type)
 
     def load_data(self, chart_title: str) -> None:
-        chart_index = self.chart_titles.index(chart_title)
-        chart = self.control_charts[chart_index]
+        chart = self.charts.chart(chart_title)
 
         # if len(gen_y_data) is not len(gen_x_data):
         #     # TODO log this? warn for this? print is okay for now
@@ -64,117 +175,227 @@ class Reviewer:
         #     #  do this check elsewhere
         #     print('%s: data and data-index lengths mismatched' % src_file)
 
-        chart.y_data = self._gen_y_data(chart_title)
-        chart.x_data = self._gen_x_data(chart_title)
-        chart.x_labels = self._gen_x_labels(chart_title)
-        chart.stdev = self._gen_st_dev(chart_title) if \
+        regions = self.data_regions
+        columns = self.data_extractor.read_regions(chart_title, regions.values())
+        chart.y_data = columns[regions['y_data']]
+        chart.x_data = columns[regions['x_data']]
+        chart.x_labels = columns[regions['x_labels']]
+        self._set_chart_stats(chart, regions, columns)
+        self._update_manifest(chart_title, {
+            region: len(columns[region]) for region in self._col_regions(regions)
+        })
+
+    @staticmethod
+    def _col_regions(regions: Dict[str, Region]) -> List[Region]:
+        return [regions[key] for key in ('y_data', 'x_data', 'x_labels')]
+
+    def _set_chart_stats(self, chart: ControlChart, regions: Dict[str, Region],
+                         columns: Dict[Region, List[Any]]) -> None:
+        chart.stdev = columns[regions[config.STDEV]][0] if \
             self.config['try_to_load_stats_data'] else None
-        chart.mean = self._gen_mean(chart_title) if \
+        chart.mean = columns[regions[config.MEAN]][0] if \
             self.config['try_to_load_stats_data'] else None
 
+    def _update_manifest(self, chart_title: str, rows: Dict[Region, int]) -> None:
+        # uploaded files are file-like objects & can't be re-scanned
+        # files are only hashed if the extraction cache already needed it
+        src_file = self.charts.src_file(chart_title)
+        if isinstance(src_file, (str, os.PathLike)):
+            self.manifest[src_file] = {
+                'fingerprint': self.data_extractor.src_fingerprint(chart_title, hashed=False),
+                'rows'       : rows,
+            }
+
+    def _load_appended_rows(self, chart_title: str) -> None:
+        """
+        read only the rows past the last row read from each data col,
+        stats cells are read again & the new rows are joined onto the
+        chart's data
+        """
+        chart = self.charts.chart(chart_title)
+        src_file = self.charts.src_file(chart_title)
+
+        regions = self.data_regions
+        old_rows = self.manifest[src_file]['rows']
+        tail_regions = {
+            region: (
+                (region[0] or 1) + old_rows[region], *region[1:]
+            ) if region in old_rows else region
+            for region in regions.values()
+        }
+        new_columns = self.data_extractor.read_regions(chart_title, tail_regions.values())
+        columns = {region: new_columns[tail_region] for region, tail_region in tail_regions.items()}
+        chart.append_data(
+                columns[regions['y_data']],
+                columns[regions['x_data']],
+                columns[regions['x_labels']]
+        )
+        self._set_chart_stats(chart, regions, columns)
+        self._update_manifest(chart_title, {
+            region: old_rows[region] + len(columns[region]) for region in old_rows
+        })
+
     def load_all_data(self) -> None:
-        for chart_title, chart in zip(self.chart_titles, self.control_charts):
+        for chart_title in self.chart_titles:
             self.load_data(chart_title)
 
     def add_chart(self, src_file: str, chart_type: Type[ControlChart],
                   title=None) -> None:
-        if title in self.chart_titles:
-            raise ValueError('Chart title cannot be a duplicate')
-
         # for all uses of title:
         # if not title then title <- DataExtractor.clean_file_names(src_file)
+        if (title or self.data_extractor.clean_file_names(src_file)) in self.charts:
+            raise ValueError('Chart title cannot be a duplicate')
+
         chart = chart_type(
                 y_data=None,
-                title=title or self.data_extractor.clean_file_names(src_file)
+                title=title or self.data_extractor.clean_file_names(src_file),
+                stats_backend=self.config['stats_backend']
         )
 
-        self.data_extractor.add_workbook(src_file, title)
-        self.control_chart_data.append([src_file, chart])
+        # regions that weren't cached or extracted are read from src_file later
+        self.data_extractor.add_src_file(src_file, chart.title)
+        if chart.title not in self.data_extractor.extracted and \
+                not self.data_extractor.load_cached(src_file, self.data_regions.values(), title):
+            self.data_extractor.add_workbook(src_file, title)
+        self.charts.add(chart.title, src_file, chart)
 
-    def _gen_y_data(self, chart_title) -> List:
-        reg = (
-            self.data_min_row,
-            self.data_max_row,
-            self.y_data_col,
-            self.y_data_col
-        )
-        yield from self.data_extractor.gen_items_in_region(
-                chart_title,
-                *reg,
-                self.data_sheet_index
-        )
+    @property
+    def data_regions(self) -> Dict[str, Region]:
+        """
+        the regions read from each src file, keyed by what's read
+        stats data is only read when try_to_load_stats_data is set
+        """
+        regions = {
+            'y_data'  : self._col_region(self.y_data_col),
+            'x_data'  : self._col_region(self.x_data_col),
+            'x_labels': self._col_region(self.x_label_col),
+        }
+        if self.config['try_to_load_stats_data']:
+            regions[config.STDEV] = self._cell_region(*self.stats_data_addresses[config.STDEV])
+            regions[config.MEAN] = self._cell_region(*self.stats_data_addresses[config.MEAN])
+        return regions
+
+    def _col_region(self, col) -> Region:
+        return self.data_min_row, self.data_max_row, col, col, self.data_sheet_index
+
+    def _cell_region(self, row, col) -> Region:
+        return row, row, col, col, self.data_sheet_index
+
+    def refresh(self, src_dir: str, chart_type: Type[ControlChart],
+                append_only: bool = False) -> Dict[str, List[str]]:
+        """
+        pick up files added to, removed from & modified in param src_dir
+        since it was loaded, unchanged charts aren't read or checked again
+
+        with append_only modified files are assumed to only have had rows
+        added, so only rows past the last row read are read
+        returns the titles of charts added, removed & modified
+        """
+        src_dir = os.path.abspath(src_dir)
+        files = {
+            os.path.abspath(src_file): src_file for src_file in self.data_extractor.gen_files(
+                    src_dir,
+                    config.EXCEL_FILE_EXTENSIONS + config.CSV_FILE_EXTENSIONS
+            )
+        }
+        changes = {'added': [], 'removed': [], 'modified': []}
 
-    def _gen_x_data(self, chart_title) -> List:
-        reg = (
-            self.data_min_row,
-            self.data_max_row,
-            self.x_data_col,
-            self.x_data_col
-        )
-        yield from self.data_extractor.gen_items_in_region(
-                chart_title,
-                *reg,
-                self.data_sheet_index
-        )
+        # uploaded files are file-like objects & are left alone
+        charts = {
+            os.path.abspath(src_file): (src_file, chart.title)
+            for src_file, chart in self.charts
+            if isinstance(src_file, (str, os.PathLike))
+        }
+        for path, (src_file, title) in charts.items():
+            if os.path.dirname(path) == src_dir and path not in files:
+                self.remove_chart(title)
+                changes['removed'].append(title)
+
+        for path, src_file in files.items():
+            if path not in charts:
+                self.add_chart(src_file, chart_type)
+                title = self.charts.title_at(-1)
+                self.load_data(title)
+                changes['added'].append(title)
+                continue
 
-    def _gen_x_labels(self, chart_title) -> List:
-        reg = (
-            self.data_min_row,
-            self.data_max_row,
-            self.x_label_col,
-            self.x_label_col
-        )
-        yield from self.data_extractor.gen_items_in_region(
-                chart_title,
-                *reg,
-                self.data_sheet_index
-        )
+            src_file, title = charts[path]
+            manifest_entry = self.manifest.get(src_file)
+            if manifest_entry and is_unchanged(src_file, manifest_entry['fingerprint']):
+                continue
 
-    def _gen_st_dev(self, chart_title) -> List:
-        reg = (
-            self.stats_data_addresses[config.STDEV][0],
-            self.stats_data_addresses[config.STDEV][0],
-            self.stats_data_addresses[config.STDEV][1],
-            self.stats_data_addresses[config.STDEV][1]
-        )
-        yield from self.data_extractor.gen_items_in_region(
-                chart_title,
-                *reg,
-                self.data_sheet_index
-        )
+            # the open workbook & anything read from it are stale
+            self.data_extractor.remove_workbook(title)
+            self.data_extractor.add_workbook(src_file, title)
+            if append_only and manifest_entry:
+                self._load_appended_rows(title)
+            else:
+                self.load_data(title)
+            changes['modified'].append(title)
 
-    def _gen_mean(self, chart_title) -> List:
-        reg = (
-            self.stats_data_addresses[config.MEAN][0],
-            self.stats_data_addresses[config.MEAN][0],
-            self.stats_data_addresses[config.MEAN][1],
-            self.stats_data_addresses[config.MEAN][1]
-        )
-        yield from self.data_extractor.gen_items_in_region(
-                chart_title,
-                *reg,
-                self.data_sheet_index
-        )
+        self.check_rules(changes['added'] + changes['modified'])
+        return changes
+
+    def remove_chart(self, chart_title: str) -> None:
+        src_file, chart = self.charts.remove(chart_title)
+        self.data_extractor.remove_workbook(chart_title)
+        if isinstance(src_file, (str, os.PathLike)):
+            self.manifest.pop(src_file, None)
 
     def check_all_rules(self):
-        for chart in self.control_charts:
-            if not chart.plotted_x_data:
+        self.check_rules(self.chart_titles)
+
+    def check_rules(self, chart_titles: List[str]) -> None:
+        for chart_title in chart_titles:
+            chart = self.charts.chart(chart_title)
+            if not len(chart.plotted_x_data):
                 print(
                         f'Trying to check chart without loading data: '
                         f'{chart.title}'
                 )
                 continue
 
-            chart.signals = self.rule_checker.check_all_rules(
+            chart.signal_table = self.rule_checker.find_signals(
                     chart.plotted_y_data,
                     st_dev=chart.stdev,
                     mean=chart.mean
             )
 
-    def build_report(self, report_name=None, save=True):
-        self.report = Reviewer.DefaultReport()
+    def stream_rules(self, chart_title) -> StreamingRuleChecker:
+        """
+        return a StreamingRuleChecker caught up with the chart's data
+        new points pushed to it are checked against the chart's current
+        stats data without rechecking the chart's history
+        """
+        chart = self.charts.chart(chart_title)
+        rule_checker = StreamingRuleChecker(
+                self.rule_checker.rules,
+                st_dev=chart.stdev,
+                mean=chart.mean
+        )
+        rule_checker.extend(chart.plotted_y_data.tolist())
+        return rule_checker
+
+    def build_report(self, report_name=None, save=True, jobs: int = 1,
+                     streaming: bool = False, vector: bool = False):
+        """
+        with streaming each chart's pages are laid out & written to the
+        report file one chart at a time as the report is saved, bypassing
+        ControlChart.render_cache
+
+        with vector charts are drawn straight onto the page & no images
+        are rendered at all
+
+        with jobs > 1 each chart's pages are rendered & laid out as a pdf
+        of their own in a pool of that many processes, this process only
+        merges them into the report in chart order
+        """
+        self.report = Reviewer.DefaultReport(streaming=streaming, vector=vector, jobs=jobs)
         for chart in self.control_charts:
-            self.report.add_chart(chart, signal_labels=chart.x_labels)
+            self.report.add_chart(
+                    chart,
+                    signal_labels=chart.x_labels
+            )
         self.report.name = report_name
 
         if save:
@@ -184,8 +405,7 @@ class Reviewer:
         self.report.save()
 
     def swap_chart_order(self, pos1, pos2) -> None:
-        self.control_chart_data[pos2], self.control_chart_data[pos1] = \
-            self.control_chart_data[pos1], self.control_chart_data[pos2]
+        self.charts.swap(pos1, pos2)
 
     def move_chart_up(self, pos) -> None:
         Reviewer._can_move(pos, pos - 1) and self.swap_chart_order(pos, pos - 1)
@@ -201,16 +421,13 @@ class Reviewer:
         return True
 
     def overwrite_mean(self, chart_title, mean):
-        chart_idx = self.chart_titles.index(chart_title)
-        self.control_charts[chart_idx].mean = mean
+        self.charts.chart(chart_title).mean = mean
 
     def overwrite_stdev(self, chart_title, stdev):
-        chart_idx = self.chart_titles.index(chart_title)
-        self.control_charts[chart_idx].stdev = stdev
+        self.charts.chart(chart_title).stdev = stdev
 
     def resize_chart_axes(self, chart_title, x_min, x_max, y_min, y_max):
-        chart_idx = self.chart_titles.index(chart_title)
-        self.control_charts[chart_idx].plot.resize_plot_axes(
+        self.charts.chart(chart_title).plot.resize_plot_axes(
                 x_min,
                 x_max,
                 y_min,
@@ -218,16 +435,13 @@ class Reviewer:
         )
 
     def set_data_start_by_idx(self, chart_title: str, idx: Any):
-        chart_idx = self.chart_titles.index(chart_title)
-        chart = self.control_charts[chart_idx]
-        chart.start_idx = idx
+        chart = self.charts.chart(chart_title)
+        chart.start_at_index(idx)
 
     def set_data_start_date(self, chart_title, dt: datetime):
-        chart_idx = self.chart_titles.index(chart_title)
-        chart = self.control_charts[chart_idx]
-        chart.start_at_label = dt
+        chart = self.charts.chart(chart_title)
+        chart.start_at_label(dt)
 
     def set_data_end_date(self, chart_title, dt: datetime):
-        chart_idx = self.chart_titles.index(chart_title)
-        chart = self.control_charts[chart_idx]
-        chart.end_at_label = dt
+        chart = self.charts.chart(chart_title)
+        chart.end_at_label(dt)
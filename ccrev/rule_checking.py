@@ -1,8 +1,17 @@
 import copy
 import itertools
-from typing import Sequence, Type, List, Any, Union, Tuple
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Sequence, Type, List, Any, Union, Tuple, Iterable, Deque, Dict, Set
 
-from ccrev.rules import Rule, Signal
+import numpy as np
+
+from ccrev.rules import Rule, Signal, SignalTable
+
+# friendly identifiers for streamed signal events
+SIGNAL_OPENED = 'OPENED'
+SIGNAL_EXTENDED = 'EXTENDED'
+SIGNAL_CLOSED = 'CLOSED'
 
 
 # TODO return all signals as List[int]
@@ -26,6 +35,8 @@ class RuleChecker:
         """
         driver for rule-checking routine
         """
+        if isinstance(data, np.ndarray):
+            data = data.tolist()  # rules expect python numbers
 
         signal: Signal = None
         for data_index, datum in enumerate(data):
@@ -78,6 +89,12 @@ class RuleChecker:
 
     # TODO get rid of this 'return_type' stuff it's wonky
     def check_all_rules(self, data, **stats_data) -> List[int]:
+        return self.find_signals(data, **stats_data).to_ints()
+
+    def find_signals(self, data, **stats_data) -> SignalTable:
+        """
+        same as check_all_rules without expanding signals to a per-point list
+        """
         signals = []
         for rule in self.rules:
             found_signals = self.check(rule, data, return_type=Signal, **stats_data)
@@ -85,8 +102,7 @@ class RuleChecker:
 
         signals = self._flatten_signals(signals)
         signals = self._remove_overlaps(signals)
-        signals = self._signals_to_ints(signals, len(data))
-        return signals
+        return SignalTable.from_signals(signals, len(data))
 
     @staticmethod
     def _flatten_signals(signals: List[List[Signal]]) -> List[Signal]:
@@ -94,63 +110,90 @@ class RuleChecker:
         return list(signals)
 
     def _remove_overlaps(self, signals: List[Signal]) -> List[Signal]:
-        def split(signal: Signal, index: int) -> Tuple[Signal, Signal]:
-            new_signal = copy.deepcopy(signal)
-            new_signal.start_index = index
-            signal.end_index = index
-
-            return signal, new_signal
+        """
+        shorten, split or drop lower priority signals where they overlap
+        higher priority signals. signals earlier in param signals have
+        higher priority
 
-        def is_shortenable(signal: Signal, overlap_start_pos: int, overlap_end_pos: int) -> bool:
-            signal_min_len = [rule.min_len_check for rule in self.rules if rule.rule_number is signal.signal_id][0]
-            overlap_len = overlap_end_pos - overlap_start_pos
+        each signal is only compared with the higher priority signals
+        it overlaps, found by bisecting the already resolved signals of
+        each rule
+        """
+        min_lens = {rule.rule_number: rule.min_len_check for rule in self.rules}
 
-            return len(signal) - overlap_len >= signal_min_len
+        # resolved signals for each signal_id sorted by start_index
+        # signals of same priority cannot (should not) be overlapped so ends are sorted too
+        resolved_starts: Dict[int, List[int]] = {}
+        resolved_ends: Dict[int, List[int]] = {}
+        resolved: Dict[int, List[Tuple[Tuple[int, int], Signal]]] = {}
 
-        signals_to_remove = []
+        signals_to_remove = set()
+        resolved_signals = []
         for signal_index, signal in enumerate(signals):
-            remaining_signals = signals[signal_index + 1:]
-            for remaining_signal in remaining_signals:
-                if remaining_signal.signal_id is signal.signal_id:
+            overlapping = []
+            for signal_id, starts in resolved_starts.items():
+                if signal_id is signal.signal_id:
                     continue  # signals of same priority cannot (should not) be overlapped
+                first = bisect_right(resolved_ends[signal_id], signal.start_index)
+                last = bisect_left(starts, signal.end_index)
+                overlapping.extend(resolved[signal_id][first:last])
 
-                # start/end of low priority signal overlapped by high priority
-                is_overlapped_start = signal.end_index - 1 in remaining_signal
-                is_overlapped_end = signal.start_index in remaining_signal
-
-                # lower priority signal can be shortened at front/end
-                is_shortenable_start = is_overlapped_start and \
-                                       is_shortenable(
-                                           remaining_signal,
-                                           remaining_signal.start_index,
-                                           signal.end_index
-                                       )
-                is_shortenable_end = is_overlapped_end and \
-                                     is_shortenable(
-                                         remaining_signal,
-                                         signal.start_index,
-                                         remaining_signal.end_index
-                                     )
-
-                # 1 1 0 1 1 1 0 0
-                # 2 2 2 2 0 2 2 2
-
-                if is_shortenable_end and is_shortenable_start:
-                    remaining_signal, new_signal = split(remaining_signal, signal.end_index)
-                    signals.insert(signals.index(remaining_signal), new_signal)
-                    remaining_signals.insert(remaining_signals.index(remaining_signal), new_signal)
-                elif is_shortenable_end and not is_shortenable_start:
-                    remaining_signal.end_index = signal.start_index
-                elif is_shortenable_start and not is_shortenable_end:
-                    remaining_signal.start_index = signal.end_index
-
-                if (is_overlapped_end or is_overlapped_start) and not (is_shortenable_start or is_shortenable_end):
-                    signals_to_remove.append(remaining_signal)
-
-        for signal_to_remove in set(signals_to_remove):
-            signals.remove(signal_to_remove)
+            # higher priority signals are applied in the order they're listed
+            # pieces of split signals are listed back to front
+            pieces = [signal]
+            for _, high_priority_signal in sorted(overlapping, key=lambda item: item[0]):
+                pieces = [
+                    resolved_piece for piece in pieces for resolved_piece in
+                    self._resolve_overlap(high_priority_signal, piece, min_lens[piece.signal_id], signals_to_remove)
+                ]
 
-        return signals
+            for piece in pieces:
+                starts = resolved_starts.setdefault(piece.signal_id, [])
+                insert_at = bisect_left(starts, piece.start_index)
+                starts.insert(insert_at, piece.start_index)
+                resolved_ends.setdefault(piece.signal_id, []).insert(insert_at, piece.end_index)
+                resolved.setdefault(piece.signal_id, []).insert(
+                        insert_at, ((signal_index, -piece.start_index), piece)
+                )
+            resolved_signals.extend(pieces)
+
+        return [signal for signal in resolved_signals if signal not in signals_to_remove]
+
+    @staticmethod
+    def _resolve_overlap(signal: Signal, remaining_signal: Signal, min_len: int,
+                         signals_to_remove: Set[Signal]) -> List[Signal]:
+        """
+        shorten, split or mark for removal the lower priority remaining_signal
+        where it's overlapped by signal
+        returns remaining_signal's pieces back to front
+        """
+        # start/end of low priority signal overlapped by high priority
+        is_overlapped_start = signal.end_index - 1 in remaining_signal
+        is_overlapped_end = signal.start_index in remaining_signal
+
+        # lower priority signal can be shortened at front/end
+        is_shortenable_start = is_overlapped_start and \
+                               remaining_signal.end_index - signal.end_index >= min_len
+        is_shortenable_end = is_overlapped_end and \
+                             signal.start_index - remaining_signal.start_index >= min_len
+
+        # 1 1 0 1 1 1 0 0
+        # 2 2 2 2 0 2 2 2
+
+        if is_shortenable_end and is_shortenable_start:
+            new_signal = Signal(remaining_signal.signal_id, signal.end_index, remaining_signal.end_index)
+            new_signal._is_positive = remaining_signal._is_positive
+            remaining_signal.end_index = signal.start_index
+            return [new_signal, remaining_signal]
+        elif is_shortenable_end and not is_shortenable_start:
+            remaining_signal.end_index = signal.start_index
+        elif is_shortenable_start and not is_shortenable_end:
+            remaining_signal.start_index = signal.end_index
+
+        if (is_overlapped_end or is_overlapped_start) and not (is_shortenable_start or is_shortenable_end):
+            signals_to_remove.add(remaining_signal)
+
+        return [remaining_signal]
 
     @staticmethod
     def _signals_to_ints(signals: List[Signal], data_length) -> List[int]:
@@ -159,3 +202,174 @@ class RuleChecker:
             converted_signals[signal.start_index:signal.end_index] = [signal.signal_id] * len(signal)
 
         return converted_signals
+
+
+class VectorizedRuleChecker(RuleChecker):
+    """
+    RuleChecker that evaluates rules as whole-array operations
+
+    each rule's .check_array finds every point a signal could start at
+    and where it would end, leaving only a walk over the found signals
+    to python. produces the same signals as RuleChecker
+    """
+
+    def check(
+            self,
+            rule: Type[Rule],
+            data: List[float],
+            return_type: Any = int,
+            **stats_data,
+    ) -> Union[List[Signal], List[int]]:
+        data = np.asarray(data, dtype=float)
+        if not len(data):
+            return []
+
+        starts, ends, positives = rule.check_array(data, **stats_data)
+        start_indexes = np.flatnonzero(starts)
+
+        # signals can't overlap signals of the same rule, so search for the
+        # next signal from the end of the last one
+        signals: List[Signal] = []
+        next_start = 0
+        while next_start < len(start_indexes):
+            data_index = int(start_indexes[next_start])
+            signal = Signal(rule.rule_number, data_index, int(min(ends[data_index], len(data))))
+            signal._is_positive = bool(positives[data_index])
+            signals.append(signal)
+            next_start = int(np.searchsorted(start_indexes, signal.end_index))
+
+        if isinstance(return_type, int):
+            signals = self._signals_to_ints(signals, len(data))
+        return signals
+
+
+class _RuleStream:
+    """
+    state machine for a single rule, fed one point at a time
+
+    mirrors RuleChecker.check but only keeps the last few points
+    """
+
+    def __init__(self, rule: Type[Rule]):
+        self.rule = rule
+        self.signals: List[Signal] = []  # closed signals
+        self.signal: Signal = None  # open signal
+
+        self._search_start: int = 0  # first index a new signal can start at
+        self._data_length: int = 0
+        self._data: Deque[float] = deque(maxlen=max(
+                rule.min_len_check,
+                (rule.min_len_continuation_check or 0) + 1,
+                rule.min_len_positivity_check or 1
+        ))
+
+    def _window(self, start: int, stop: int) -> List[float]:
+        offset = self._data_length - len(self._data)
+        return list(itertools.islice(self._data, start - offset, stop - offset))
+
+    def _is_continued(self, data_index: int, **stats_data) -> bool:
+        min_len_continuation_check = self.rule.min_len_continuation_check or 0
+        return self.rule.is_continued(
+                self._window(data_index - min_len_continuation_check, data_index + 1),
+                self.signal._is_positive,
+                self.signal,
+                **stats_data
+        )
+
+    def _close(self, data_index: int) -> Signal:
+        signal = self.signal
+        self.signals.append(signal)
+        self.signal = None
+        self._search_start = data_index
+        return signal
+
+    def push(self, datum: float, **stats_data) -> List[Tuple[str, Signal]]:
+        data_index = self._data_length
+        self._data.append(datum)
+        self._data_length += 1
+
+        events = []
+        if self.signal:
+            if self._is_continued(data_index, **stats_data):
+                self.signal.end_index += 1
+                events.append((SIGNAL_EXTENDED, self.signal))
+            else:
+                events.append((SIGNAL_CLOSED, self._close(data_index)))
+
+        # at most one new window of min_len_check points completes per point
+        while not self.signal and self._search_start + self.rule.min_len_check <= self._data_length:
+            start = self._search_start
+            if not self.rule.check(self._window(start, start + self.rule.min_len_check), **stats_data):
+                self._search_start += 1
+                continue
+
+            self.signal = Signal(self.rule.rule_number, start)
+            self.signal._is_positive = self.rule.is_positive(
+                    self._window(start, start + self.rule.min_len_positivity_check), **stats_data
+            )
+            events.append((SIGNAL_OPENED, self.signal))
+
+            # catch the new signal up with points already seen
+            for continued_index in range(start + 1, self._data_length):
+                if self._is_continued(continued_index, **stats_data):
+                    self.signal.end_index += 1
+                else:
+                    events.append((SIGNAL_CLOSED, self._close(continued_index)))
+                    break
+        return events
+
+
+class StreamingRuleChecker(RuleChecker):
+    """
+    RuleChecker that accepts points one at a time
+
+    stats data is fixed when the checker is created, points are checked
+    against it as they're pushed. .push & .extend return the signals
+    opened, extended or closed by the new points as (event, Signal) pairs
+    """
+
+    def __init__(self, rules: Sequence[Type[Rule]], **stats_data):
+        super().__init__(rules)
+        self.stats_data = stats_data
+        self._streams: List[_RuleStream] = [_RuleStream(rule) for rule in rules]
+        self._data_length: int = 0
+
+    def __len__(self):
+        return self._data_length
+
+    def push(self, datum: float) -> List[Tuple[str, Signal]]:
+        self._data_length += 1
+        events = []
+        for stream in self._streams:
+            events.extend(stream.push(datum, **self.stats_data))
+        return events
+
+    def extend(self, data: Iterable[float]) -> List[Tuple[str, Signal]]:
+        events = []
+        for datum in data:
+            events.extend(self.push(datum))
+        return events
+
+    @property
+    def signals(self) -> List[Signal]:
+        """
+        all signals found so far, open or closed, in check_all_rules order
+        """
+        signals = []
+        for stream in self._streams:
+            signals.append(stream.signals + ([stream.signal] if stream.signal else []))
+        return self._flatten_signals(signals)
+
+    def signal_table(self) -> SignalTable:
+        """
+        same as find_signals over every point pushed so far
+        """
+        signals = [copy.copy(signal) for signal in self.signals]
+        signals = self._remove_overlaps(signals)
+        return SignalTable.from_signals(signals, self._data_length)
+
+    def signals_to_ints(self) -> List[int]:
+        """
+        same as check_all_rules over every point pushed so far
+        """
+        return self.signal_table().to_ints()
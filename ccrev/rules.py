@@ -1,13 +1,50 @@
 from __future__ import annotations
 
 import abc
-from typing import List
+from bisect import bisect_right
+from typing import List, Tuple, Sequence
+
+import numpy as np
 
 # TODO should be declared elsewhere
 # cant import from config because circular imports
 ST_DEV, MEAN = 'st_dev', 'mean'
 
 
+def _rolling_all(mask: np.ndarray, window: int, length: int) -> np.ndarray:
+    """
+    true at i if mask[i:i + window] is all true
+    result is padded with False to param length
+    """
+    out = np.zeros(length, dtype=bool)
+    if len(mask) < window:
+        return out
+    counts = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    out[:len(mask) - window + 1] = (counts[window:] - counts[:-window]) == window
+    return out
+
+
+def _run_ends(keys: np.ndarray) -> np.ndarray:
+    """
+    exclusive end index of the run of equal values containing each index
+    (i.e. [1, 1, 0, 0, 0] -> [2, 2, 5, 5, 5])
+    """
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    run_starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    run_ends = np.append(run_starts, len(keys))
+    run_ids = np.zeros(len(keys), dtype=np.int64)
+    run_ids[run_starts] = 1
+    return run_ends[np.cumsum(run_ids)]
+
+
+def _signs(data: np.ndarray) -> np.ndarray:
+    """
+    -1, 0 or 1 for each value, NaN compares like the python rules (0)
+    """
+    return (data > 0).astype(np.int8) - (data < 0).astype(np.int8)
+
+
 class Rule:
     """
     used to check for data patterns (trends) specified by .check and min duration
@@ -48,6 +85,19 @@ class Rule:
         """
         raise NotImplementedError
 
+    @staticmethod
+    @abc.abstractmethod
+    def check_array(data: np.ndarray, **stats_data) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        whole-array equivalent of .check, .is_continued and .is_positive
+
+        returns (starts, ends, positives), each the length of param data
+        starts[i] is true where .check passes for data[i:i + min_len_check]
+        ends[i] is the exclusive end index of a signal started at i
+        positives[i] is .is_positive for a signal started at i
+        """
+        raise NotImplementedError
+
 
 class Rule1(Rule):
     """
@@ -71,6 +121,14 @@ class Rule1(Rule):
     def is_positive(data: List[float], **stats_data) -> bool:
         return all(datum > stats_data[MEAN] for datum in data)
 
+    @staticmethod
+    def check_array(data: np.ndarray, **stats_data) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        lower = stats_data[MEAN] - 3 * stats_data[ST_DEV]
+        upper = stats_data[MEAN] + 3 * stats_data[ST_DEV]
+        starts = ~((lower < data) & (data < upper))
+        ends = np.arange(1, len(data) + 1)
+        return starts, ends, data > stats_data[MEAN]
+
 
 class Rule2(Rule):
     """
@@ -94,6 +152,14 @@ class Rule2(Rule):
     def is_positive(data: List[float], **stats_data) -> bool:
         return all(datum > stats_data[MEAN] for datum in data)
 
+    @staticmethod
+    def check_array(data: np.ndarray, **stats_data) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # run-length encode each point's side of the mean
+        sides = _signs(data - stats_data[MEAN])
+        starts = _rolling_all(sides > 0, Rule2.min_len_check, len(data)) | \
+                 _rolling_all(sides < 0, Rule2.min_len_check, len(data))
+        return starts, _run_ends(sides), sides > 0
+
 
 class Rule3(Rule):
     """
@@ -122,6 +188,18 @@ class Rule3(Rule):
     def is_positive(data: List[float], **stats_data) -> bool:
         return data[0] < data[len(data) - 1]
 
+    @staticmethod
+    def check_array(data: np.ndarray, **stats_data) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # steps[i] is the direction from data[i] to data[i + 1]
+        steps = _signs(np.diff(data))
+        num_steps = Rule3.min_len_check - 1
+        starts = _rolling_all(steps > 0, num_steps, len(data)) | \
+                 _rolling_all(steps < 0, num_steps, len(data))
+        # trend continues through the last point of its run of steps
+        ends = np.append(_run_ends(steps) + 1, len(data))
+        positives = np.append(steps > 0, False)
+        return starts, ends, positives
+
 
 class Rule4(Rule):
     """
@@ -154,8 +232,31 @@ class Rule4(Rule):
     def is_positive(data: List[float], **stats_data) -> bool:
         return data[0] < data[1]
 
+    @staticmethod
+    def check_array(data: np.ndarray, **stats_data) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        steps = _signs(np.diff(data))
+        # alternations[i] is true if data[i:i + 3] changes direction
+        alternations = steps[:-1] * steps[1:] == -1
+        starts = _rolling_all(alternations, Rule4.min_len_check - 2, len(data))
+        positives = np.append(steps > 0, False)
+
+        # positive signals run until the oscillation breaks, .is_continued
+        # never continues a negative signal past its second point
+        alternation_ends = np.concatenate((
+            np.where(alternations, _run_ends(alternations), np.arange(len(alternations))),
+            np.full(min(2, len(data)), len(alternations))
+        ))
+        ends = np.where(
+                positives,
+                alternation_ends + 2,
+                np.arange(len(data)) + 2
+        )
+        return starts, ends, positives
+
 
 class Signal:
+    __slots__ = ('signal_id', 'start_index', 'end_index', '_is_positive')
+
     def __init__(self, signal_id: int, start_index: int, end_index: int = None):
         self.signal_id: int = signal_id  # identify rule associated w/ signal
         self.start_index: int = start_index
@@ -167,4 +268,119 @@ class Signal:
         return data_index in range(self.start_index, self.end_index)
 
     def __len__(self):
-        return self.end_index - self.start_index
\ No newline at end of file
+        return self.end_index - self.start_index
+
+
+class SignalTable:
+    """
+    compact, non-overlapping records of the signals found in a chart
+
+    one record per (rule_number, start, end, is_positive) stored in a
+    structured array sorted by start. where signals overlap the record
+    for the later signal wins, same as painting them into a per-point list
+    """
+    DTYPE = np.dtype([
+        ('rule_number', np.int8),
+        ('start', np.int64),
+        ('end', np.int64),
+        ('is_positive', np.bool_),
+    ])
+
+    def __init__(self, records: np.ndarray = None, data_length: int = 0):
+        self.records: np.ndarray = records if records is not None else np.zeros(0, dtype=SignalTable.DTYPE)
+        self.data_length = data_length
+
+    def __len__(self):
+        return len(self.records)
+
+    @classmethod
+    def from_signals(cls, signals: Sequence[Signal], data_length: int) -> SignalTable:
+        # paint signals last to first, keeping only parts not already painted
+        painted_starts: List[int] = []
+        painted_ends: List[int] = []
+        records = []
+        for signal in reversed(signals):
+            start, end = signal.start_index, min(signal.end_index, data_length)
+            if start >= end:
+                continue
+
+            first = last = bisect_right(painted_ends, start)
+            unpainted_start = start
+            while last < len(painted_starts) and painted_starts[last] < end:
+                if unpainted_start < painted_starts[last]:
+                    records.append((signal.signal_id, unpainted_start, painted_starts[last], bool(signal._is_positive)))
+                unpainted_start = max(unpainted_start, painted_ends[last])
+                last += 1
+            if unpainted_start < end:
+                records.append((signal.signal_id, unpainted_start, end, bool(signal._is_positive)))
+
+            # merge newly painted points with the painted ranges they overlap
+            if first < last:
+                start, end = min(start, painted_starts[first]), max(end, painted_ends[last - 1])
+            painted_starts[first:last] = [start]
+            painted_ends[first:last] = [end]
+
+        records = np.array(records, dtype=SignalTable.DTYPE)
+        records.sort(order='start')
+        return cls(records, data_length)
+
+    @classmethod
+    def from_ints(cls, signals: Sequence[int]) -> SignalTable:
+        """
+        build a table from a per-point list of rule numbers (0 for no signal)
+        """
+        signals = np.asarray(signals, dtype=np.int8)
+        run_starts = np.flatnonzero(np.diff(signals, prepend=0, append=0)) if len(signals) else np.zeros(0, dtype=int)
+        run_starts = run_starts[run_starts < len(signals)]
+        run_ends = np.append(run_starts[1:], len(signals))
+        is_signal = signals[run_starts] != 0
+
+        records = np.zeros(np.count_nonzero(is_signal), dtype=SignalTable.DTYPE)
+        records['rule_number'] = signals[run_starts[is_signal]]
+        records['start'] = run_starts[is_signal]
+        records['end'] = run_ends[is_signal]
+        return cls(records, len(signals))
+
+    @property
+    def rule_numbers(self) -> List[int]:
+        """
+        sorted rule numbers with at least one signal
+        """
+        return sorted(set(self.records['rule_number'].tolist()))
+
+    def runs(self, rule_number: int) -> List[Tuple[int, int]]:
+        """
+        [start, end) index pairs of consecutive points signaling param rule_number
+        """
+        records = self.records[self.records['rule_number'] == rule_number]
+        if not len(records):
+            return []
+        # adjacent records of the same rule read as one run
+        is_run_start = np.append(True, records['start'][1:] != records['end'][:-1])
+        is_run_end = np.append(is_run_start[1:], True)
+        return list(zip(
+                records['start'][is_run_start].tolist(),
+                records['end'][is_run_end].tolist()
+        ))
+
+    def mask(self, rule_number: int = None) -> np.ndarray:
+        """
+        per-point boolean array, True where param rule_number signals
+        or where any rule signals if rule_number is None
+        """
+        records = self.records
+        if rule_number is not None:
+            records = records[records['rule_number'] == rule_number]
+        edges = np.zeros(self.data_length + 1, dtype=np.int64)
+        np.add.at(edges, records['start'], 1)
+        np.add.at(edges, records['end'], -1)
+        return np.cumsum(edges[:-1]) > 0
+
+    def to_ints(self) -> List[int]:
+        """
+        per-point list of rule numbers, 0 where no rule signals
+        """
+        signals = np.zeros(self.data_length, dtype=np.int8)
+        for rule_number, start, end, _ in self.records.tolist():
+            signals[start:end] = rule_number
+        return signals.tolist()
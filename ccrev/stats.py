@@ -0,0 +1,254 @@
+import math
+import statistics
+from typing import Sequence, Tuple, Union, Iterable, Dict
+
+import numpy as np
+
+# friendly identifiers for stats backends
+EXACT = 'EXACT'
+NUMPY = 'NUMPY'
+WELFORD = 'WELFORD'
+
+EPSILON: float = float(np.finfo(float).eps)
+
+
+class PrefixSums:
+    """
+    cumulative sum & sum of squares of a data series
+
+    built once per series, after which the mean and standard deviation
+    of a [start, end) window are normally found in constant time
+
+    values are shifted by the series median before summing so the sums
+    stay small for series far from 0 (i.e. pH ~7 +/- 0.05) and a single
+    outlier can't set the shift. the rounding error of each window's
+    result is bounded from the sums, windows where it could exceed
+    rel_tol (a drifting series, or a window after a large outlier, where
+    the subtraction cancels most of the digits) are found from the data
+    in two passes instead, in time linear in the window length
+    """
+    rel_tol: float = 1e-10
+    block_size: int = 256
+
+    def __init__(self, data: Sequence[float]):
+        self.data: np.ndarray = np.asarray(data, dtype=float)
+        self.shift: float = float(np.median(self.data)) if len(self.data) else 0.
+        shifted = self.data - self.shift
+        self.sums: np.ndarray = self._cumsum(shifted)
+        self.abs_sums: np.ndarray = self._cumsum(np.abs(shifted))
+        self.sums_of_squares: np.ndarray = self._cumsum(shifted * shifted)
+
+    def __len__(self):
+        return len(self.sums) - 1
+
+    def window(self, start: int = None, end: int = None) -> Tuple[int, int]:
+        """
+        normalize start & end the same way as data[start:end]
+        """
+        start, end, _ = slice(start, end).indices(len(self))
+        return start, max(start, end)
+
+    @classmethod
+    def _cumsum(cls, values: np.ndarray) -> np.ndarray:
+        """
+        running sum with a leading 0, summed within blocks and then
+        across block totals so rounding error grows with
+        block_size + len(values) / block_size rather than len(values)
+        """
+        num_blocks = -(-len(values) // cls.block_size)
+        blocks = np.zeros(num_blocks * cls.block_size)
+        blocks[:len(values)] = values
+        blocks = np.cumsum(blocks.reshape(num_blocks, cls.block_size), axis=1)
+        offsets = np.concatenate(([0.], np.cumsum(blocks[:-1, -1])))
+        return np.concatenate(([0.], (blocks + offsets[:, None]).ravel()[:len(values)]))
+
+    @classmethod
+    def _rounding_error(cls, cumulative: np.ndarray, start: int, end: int) -> float:
+        """
+        bound on the error of cumulative[end] - cumulative[start]
+        for a running sum of non-negative terms from _cumsum
+        """
+        def terms(index):
+            return min(index, cls.block_size) + index // cls.block_size + 2
+
+        return EPSILON * (terms(end) * cumulative[end] + terms(start) * cumulative[start])
+
+    def mean(self, start: int = None, end: int = None) -> Union[float, None]:
+        start, end = self.window(start, end)
+        num = end - start
+        if num < 1:
+            return None
+        mean = (self.sums[end] - self.sums[start]) / num + self.shift
+        error = self._rounding_error(self.abs_sums, start, end) / num + EPSILON * abs(mean)
+        if error > self.rel_tol * abs(mean):
+            return float(np.mean(self.data[start:end]))
+        return float(mean)
+
+    def stdev(self, start: int = None, end: int = None) -> Union[float, None]:
+        """
+        sample standard deviation, same as statistics.stdev
+        """
+        start, end = self.window(start, end)
+        num = end - start
+        if num < 2:
+            return None
+        total = self.sums[end] - self.sums[start]
+        total_of_squares = self.sums_of_squares[end] - self.sums_of_squares[start]
+        sum_of_squared_diffs = total_of_squares - total * total / num
+        total_error = self._rounding_error(self.abs_sums, start, end)
+        error = (self._rounding_error(self.sums_of_squares, start, end)
+                 + (2 * abs(total) + total_error) * total_error / num
+                 + EPSILON * (abs(total_of_squares) + total * total / num))
+        if error > self.rel_tol * sum_of_squared_diffs:
+            return float(np.std(self.data[start:end], ddof=1))
+        return float(np.sqrt(sum_of_squared_diffs / (num - 1)))
+
+
+class RunningStats:
+    """
+    single-pass mean & sample standard deviation using Welford's method
+
+    points are pushed one at a time, nothing but the count, mean
+    and sum of squared differences is kept
+    """
+
+    def __init__(self):
+        self.count: int = 0
+        self._mean: float = 0.
+        self._sum_of_squared_diffs: float = 0.
+
+    def push(self, datum: float) -> None:
+        self.count += 1
+        diff = datum - self._mean
+        self._mean += diff / self.count
+        self._sum_of_squared_diffs += diff * (datum - self._mean)
+
+    def extend(self, data: Iterable[float]) -> None:
+        for datum in data:
+            self.push(datum)
+
+    @property
+    def mean(self) -> Union[float, None]:
+        return self._mean if self.count else None
+
+    @property
+    def stdev(self) -> Union[float, None]:
+        if self.count < 2:
+            return None
+        return math.sqrt(self._sum_of_squared_diffs / (self.count - 1))
+
+
+class SlicedStats:
+    """
+    window stats found by slicing the data and passing it to a backend
+    each query is linear in the window length
+    """
+
+    def __init__(self, backend, data: Sequence[float]):
+        self.backend: StatsBackend = backend
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def mean(self, start: int = None, end: int = None) -> Union[float, None]:
+        return self.backend.mean(self.data[start:end])
+
+    def stdev(self, start: int = None, end: int = None) -> Union[float, None]:
+        return self.backend.stdev(self.data[start:end])
+
+
+class StatsBackend:
+    """
+    mean & sample standard deviation of chart & template data
+
+    rel_tol is the relative tolerance of results against ExactBackend,
+    including for series far from 0 with a small spread, drifting series
+    and series with far outliers
+    mean and stdev return None where statistics.mean & statistics.stdev
+    would raise for too few points
+    """
+    name: str = None
+    rel_tol: float = None
+
+    def mean(self, data: Sequence[float]) -> Union[float, None]:
+        raise NotImplementedError
+
+    def stdev(self, data: Sequence[float]) -> Union[float, None]:
+        raise NotImplementedError
+
+    def windowed(self, data: Sequence[float]) -> Union[SlicedStats, PrefixSums]:
+        """
+        return an object with .mean(start, end) & .stdev(start, end)
+        for windows of param data
+        """
+        return SlicedStats(self, data)
+
+
+class ExactBackend(StatsBackend):
+    """
+    exact rational arithmetic from the statistics module, slowest
+    """
+    name = EXACT
+    rel_tol = 0.
+
+    def mean(self, data: Sequence[float]) -> Union[float, None]:
+        return statistics.mean(data) if len(data) else None
+
+    def stdev(self, data: Sequence[float]) -> Union[float, None]:
+        return statistics.stdev(data) if len(data) > 1 else None
+
+
+class NumpyBackend(StatsBackend):
+    """
+    float64 arithmetic, windows of a series are served by PrefixSums,
+    which falls back to two passes over the window to stay within rel_tol
+    """
+    name = NUMPY
+    rel_tol = 1e-9
+
+    def mean(self, data: Sequence[float]) -> Union[float, None]:
+        return float(np.mean(np.asarray(data, dtype=float))) if len(data) else None
+
+    def stdev(self, data: Sequence[float]) -> Union[float, None]:
+        return float(np.std(np.asarray(data, dtype=float), ddof=1)) if len(data) > 1 else None
+
+    def windowed(self, data: Sequence[float]) -> PrefixSums:
+        return PrefixSums(data)
+
+
+class WelfordBackend(StatsBackend):
+    """
+    single pass with RunningStats, suited to data that arrives as a stream
+    the error grows with the ratio of mean to stdev, ~5e-11 for
+    7000 +/- 0.01
+    """
+    name = WELFORD
+    rel_tol = 1e-9
+
+    def mean(self, data: Iterable[float]) -> Union[float, None]:
+        running_stats = RunningStats()
+        running_stats.extend(data)
+        return running_stats.mean
+
+    def stdev(self, data: Iterable[float]) -> Union[float, None]:
+        running_stats = RunningStats()
+        running_stats.extend(data)
+        return running_stats.stdev
+
+
+STATS_BACKENDS: Dict[str, StatsBackend] = {
+    backend.name: backend for backend in (ExactBackend(), NumpyBackend(), WelfordBackend())
+}
+
+
+def get_backend(backend: Union[str, StatsBackend]) -> StatsBackend:
+    """
+    look up a backend by name, backend instances are returned as is
+    """
+    if isinstance(backend, StatsBackend):
+        return backend
+    try:
+        return STATS_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f'Unknown stats backend: {backend}') from None
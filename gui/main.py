@@ -1,6 +1,5 @@
 import io
 import urllib.parse
-from typing import List
 
 from flask import Flask
 from flask import render_template, jsonify, request, Response, url_for
@@ -29,55 +28,45 @@ def _set_chart_type():
     selected_type = request.json['selectedType']
     currently_visible = request.json['currentlyVisible']
 
-    chart_index = app.config['reviewer'].chart_titles.index(chart_title)
-    chart = app.config['reviewer'].control_charts.index(chart_title)
-    chart_type = type(app.config['reviewer'].control_charts.index(chart_index))
+    chart = app.config['reviewer'].charts.chart(chart_title)
 
     update_plot = False
-    if not isinstance(chart_type, CHART_TYPES[selected_type]):
-        app.config['reviewer'].control_chart_data[chart_index][1] = CHART_TYPES[selected_type].from_other_chart(chart)
+    if not isinstance(chart, CHART_TYPES[selected_type]):
+        app.config['reviewer'].charts.replace_chart(chart_title, CHART_TYPES[selected_type].from_other_chart(chart))
         update_plot = True
 
     return jsonify({'updatePlot': currently_visible and update_plot})
 
 
 def _load_data(chart_title) -> None:
-    control_charts: List[ControlChart] = app.config['reviewer'].control_charts
-    chart_titles = app.config['reviewer'].chart_titles
-    chart_index = chart_titles.index(chart_title)
-    src_file = app.config['reviewer'].chart_src_files[chart_index]
-    data_extractor = app.config['reviewer'].data_extractor
-    control_charts[chart_index].y_data = data_extractor.get_excel_data(src_file)
+    app.config['reviewer'].load_data(chart_title)
 
 
 @app.route('/show_chart', methods=['POST'])
 def show_chart():
     chart_title = request.json['chartTitle']
-    control_charts: List[ControlChart] = app.config['reviewer'].control_charts
-    chart_titles = app.config['reviewer'].chart_titles
-    chart_index = chart_titles.index(chart_title)
-    not control_charts[chart_index].data and app.config['reviewer'].load_data(chart_title=chart_title)
+    chart: ControlChart = app.config['reviewer'].charts.chart(chart_title)
+    not len(chart.y_data) and app.config['reviewer'].load_data(chart_title=chart_title)
     return render_template(
             'plot.html',
             chart_title=chart_title,
-            chartType=type(control_charts[chart_index]),
+            chartType=type(chart),
             plotUrl=url_for('plot', chart_title=f'{chart_title}')
     )
 
 
 @app.route('/<chart_title>.png')
 def plot(chart_title):
-    chart_index = app.config['reviewer'].chart_titles.index(chart_title)
-    plot = app.config['reviewer'].control_charts[chart_index].bytes
+    plot = app.config['reviewer'].charts.chart(chart_title).bytes
     return Response(plot.getvalue(), mimetype='image/png')
 
 
 @app.route('/_move_chart', methods=['POST'])
 def _move_chart():
     move_up = request.json['moveUp']
-    titles = app.config['reviewer'].chart_titles
-    chart_index = titles.index(request.json['chartTitle'])
-    num_charts = len(titles)
+    charts = app.config['reviewer'].charts
+    chart_index = charts.position(request.json['chartTitle'])
+    num_charts = len(charts)
 
     success = (move_up and chart_index > 0) or (not move_up and chart_index < num_charts - 1)
     success and move_up and app.config['reviewer'].move_chart_up(chart_index)
@@ -89,10 +78,9 @@ def _move_chart():
 def _delete_chart():
     success = False
     try:
-        chart_index = app.config['reviewer'].chart_titles.index(request.json['chartTitle'])
-        del app.config['reviewer'].control_chart_data[chart_index]
+        app.config['reviewer'].remove_chart(request.json['chartTitle'])
         success = True
-    except ValueError:
+    except KeyError:
         pass
     finally:
         return jsonify({'success': success})
@@ -115,7 +103,10 @@ def _upload():
 
 
 if __name__ == '__main__':
-    reviewer = Reviewer(**config.REVIEWER_KWARGS)
+    reviewer = Reviewer(
+        **config.REVIEWER_KWARGS,
+        extraction_cache_dir=config.EXTRACTION_CACHE_DIR
+    )
     reviewer.add_charts(TEST_DIR, IChart)
 
     app: Flask
@@ -1,7 +1,6 @@
 import datetime
 import math
 import os
-import statistics
 import sys
 from dataclasses import dataclass
 from typing import Tuple, Union, Generator, Any
@@ -10,6 +9,7 @@ import openpyxl
 import openpyxl.cell
 
 from ccrev import config
+from ccrev.stats import get_backend
 
 
 @dataclass(eq=False)
@@ -73,13 +73,14 @@ class ControlChartTemplate:
             min_row=self.min_row_cols, min_col=self.data_col, max_col=self.data_col,
             values_only=False
         )
-        expected_mean = statistics.mean(list(cell.value for row in data_iter for cell in row))
+        stats_backend = get_backend(config.STATS_BACKEND)
+        expected_mean = stats_backend.mean(list(cell.value for row in data_iter for cell in row))
         data_iter = self.get_row_iter(
             ws,
             min_row=self.min_row_cols, min_col=self.data_col, max_col=self.data_col,
             values_only=False
         )
-        expected_st_dev = statistics.stdev(list(cell.value for row in data_iter for cell in row))
+        expected_st_dev = stats_backend.stdev(list(cell.value for row in data_iter for cell in row))
 
         self.validate(mean, expected_types=(int, float), approx_values_expected=(expected_mean,))
         self.validate(stdev, expected_types=(int,), approx_values_expected=(expected_st_dev,))